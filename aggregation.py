@@ -0,0 +1,185 @@
+import bisect
+import itertools
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from pydantic import BaseModel
+
+from core import FramadatePoll, PolledDay
+from status import StatusThresholds
+
+DayKey = Tuple[date, int, str]
+"""Sort key of a day: its date, the position of its poll and the poll_uri"""
+
+
+class DayRollup(BaseModel):
+    """Staffing of all polls on one date"""
+
+    date: date
+    polls: int = 0
+    """Number of polls with a day on the date"""
+    positives: int = 0
+    maybes: int = 0
+    total: float = 0.0
+    """Sum of the estimated staff of all time slots on the date"""
+    statuses: Dict[str, int] = {}
+    """Number of days per status"""
+
+
+class _Contribution(BaseModel):
+    positives: int
+    maybes: int
+    total: float
+    status: Optional[str]
+
+
+class PollAggregation:
+    """Days of many polls in one date-ordered index
+
+    Days on the same date are ordered by the position of their poll, i.e. the order
+    in which the polls were added first. Updating a poll only touches its own days
+    and is skipped if its poll data did not change, so a refresh of many polls costs
+    little more than the polls that actually changed. The staffing of every day is
+    recorded when its poll is updated, as the time slots of a poll are updated in
+    place.
+    """
+
+    def __init__(self):
+        self._keys: List[DayKey] = []
+        """Sorted keys of all days"""
+        self._days: Dict[DayKey, PolledDay] = {}
+        self._contributions: Dict[DayKey, _Contribution] = {}
+        self._poll_keys: Dict[str, List[DayKey]] = {}
+        self._poll_state: Dict[
+            str, Tuple[Optional[str], List[PolledDay], Optional[StatusThresholds]]
+        ] = {}
+        """Digest, days and thresholds of every poll as of its last update"""
+        self._poll_position: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, poll_uri: str) -> bool:
+        return poll_uri in self._poll_keys
+
+    @property
+    def poll_uris(self) -> List[str]:
+        """poll_uri of all polls in the aggregation"""
+        return list(self._poll_keys)
+
+    def update_poll(self, poll: FramadatePoll, force: bool = False) -> bool:
+        """Replace the days of the poll, unless they are unchanged since the last
+        update. Returns whether the days were replaced.
+
+        The statuses of the days change with the poll data or the thresholds. Use
+        force after deciding the statuses again for any other reason.
+        """
+        # Processing the poll in another thread changes its days in place
+        with poll.lock:
+            return self._update_poll(poll, force)
+
+    def _update_poll(self, poll: FramadatePoll, force: bool) -> bool:
+        days = poll.days
+        state = self._poll_state.get(poll.poll_uri)
+        if (
+                not force and state is not None
+                and state[0] == poll.poll_data_digest and state[1] is days
+                and state[2] == poll.thresholds
+        ):
+            return False
+        self.remove_poll(poll.poll_uri)
+        position = self._poll_position.setdefault(
+            poll.poll_uri, len(self._poll_position)
+        )
+        keys = []
+        for day in days:
+            key = (day.date, position, poll.poll_uri)
+            bisect.insort(self._keys, key)
+            self._days[key] = day
+            self._contributions[key] = _Contribution(
+                positives=sum(time_slot.positives for time_slot in day.time_slots),
+                maybes=sum(time_slot.maybes for time_slot in day.time_slots),
+                total=sum(time_slot.total for time_slot in day.time_slots),
+                status=day.status.value if day.status is not None else None,
+            )
+            keys.append(key)
+        self._poll_keys[poll.poll_uri] = keys
+        thresholds = poll.thresholds.model_copy() if poll.thresholds else None
+        self._poll_state[poll.poll_uri] = (poll.poll_data_digest, days, thresholds)
+        return True
+
+    def remove_poll(self, poll_uri: str) -> None:
+        for key in self._poll_keys.pop(poll_uri, []):
+            del self._keys[bisect.bisect_left(self._keys, key)]
+            del self._days[key]
+            del self._contributions[key]
+        self._poll_state.pop(poll_uri, None)
+
+    def prune(self, before: date) -> None:
+        """Drop all days before the date"""
+        end = bisect.bisect_left(self._keys, (before,))
+        for key in self._keys[:end]:
+            del self._days[key]
+            del self._contributions[key]
+            self._poll_keys[key[2]].remove(key)
+        del self._keys[:end]
+
+    def _range(self, start: Optional[date], end: Optional[date]) -> Iterator[DayKey]:
+        """Keys from start to end, both inclusive and open if None"""
+        lower = 0 if start is None else bisect.bisect_left(self._keys, (start,))
+        upper = (
+            len(self._keys) if end is None
+            else bisect.bisect_left(self._keys, (end + timedelta(days=1),))
+        )
+        for ii in range(lower, upper):
+            yield self._keys[ii]
+
+    def __getitem__(self, key: DayKey) -> PolledDay:
+        return self._days[key]
+
+    def keys(
+            self,
+            start: Optional[date] = None,
+            end: Optional[date] = None,
+            limit: Optional[int] = None,
+    ) -> List[DayKey]:
+        """Keys of the days from start to end, both inclusive, at most limit"""
+        return list(itertools.islice(self._range(start, end), limit))
+
+    def days(
+            self, start: Optional[date] = None, end: Optional[date] = None
+    ) -> List[PolledDay]:
+        """Days from start to end, both inclusive, in chronological order"""
+        return [self._days[key] for key in self._range(start, end)]
+
+    def next_days(self, count: int, today: Optional[date] = None) -> List[PolledDay]:
+        """The next count days from today on"""
+        today = today or datetime.now().date()
+        start = bisect.bisect_left(self._keys, (today,))
+        return [self._days[key] for key in self._keys[start:start + count]]
+
+    def this_week(self, today: Optional[date] = None) -> List[PolledDay]:
+        """Days of the current week, from Monday to Sunday"""
+        today = today or datetime.now().date()
+        monday = today - timedelta(days=today.weekday())
+        return self.days(monday, monday + timedelta(days=6))
+
+    def rollup(
+            self, start: Optional[date] = None, end: Optional[date] = None
+    ) -> List[DayRollup]:
+        """Staffing summed over all polls per date, in chronological order"""
+        rollups: List[DayRollup] = []
+        for key in self._range(start, end):
+            if not rollups or rollups[-1].date != key[0]:
+                rollups.append(DayRollup(date=key[0], statuses={}))
+            rollup = rollups[-1]
+            contribution = self._contributions[key]
+            rollup.polls += 1
+            rollup.positives += contribution.positives
+            rollup.maybes += contribution.maybes
+            rollup.total += contribution.total
+            if contribution.status is not None:
+                rollup.statuses[contribution.status] = (
+                    rollup.statuses.get(contribution.status, 0) + 1
+                )
+        return rollups
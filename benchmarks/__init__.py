@@ -0,0 +1,2 @@
+"""Benchmarks of the poll processing and rendering pipeline, run with
+python -m benchmarks.run from the root of the repository"""
@@ -0,0 +1,87 @@
+import random
+from datetime import date, timedelta
+from typing import List
+
+import yaml
+
+from core import PollDataParser, PollType, Response, parse_poll_data
+
+GERMAN_RESPONSES = (Response.JA, Response.NEIN, Response.UNTERVORBEHALT, Response.UNBEKANNT)
+ENGLISH_RESPONSES = (Response.YES, Response.NO, Response.UNDERRESERVE, Response.UNKNOWN)
+RESPONSE_WEIGHTS = (4, 3, 2, 1)
+"""Relative frequency of positive, negative, maybe and unknown responses"""
+SLOT_TIMES = ("08:00", "10:00", "12:00", "14:00", "16:00", "18:00", "20:00", "22:00")
+START_DATE = date(2099, 1, 1)
+
+
+def make_poll_csv(
+        participants: int = 50,
+        days: int = 30,
+        slots_per_day: int = 4,
+        english_share: float = 0.0,
+        start: date = START_DATE,
+        seed: int = 0,
+) -> str:
+    """Generate a csv export as Framadate writes it
+
+    Args:
+        participants: Number of participant rows
+        days: Number of consecutive days
+        slots_per_day: Number of time slots per day, at most len(SLOT_TIMES)
+        english_share: Share of participants answering with the English responses
+        start: Date of the first day
+        seed: Seed of the random responses
+    """
+    rnd = random.Random(seed)
+    columns = [
+        (start + timedelta(days=ii), time_)
+        for ii in range(days) for time_ in SLOT_TIMES[:slots_per_day]
+    ]
+    lines = [
+        '"",' + ",".join(f'"{date_.isoformat()}"' for date_, _ in columns) + ",",
+        '"",' + ",".join(f'"{time_}"' for _, time_ in columns) + ",",
+    ]
+    # The rows between the header and the participants, which the parser skips
+    lines += [
+        '"",' + ",".join('""' for _ in columns) + ","
+    ] * PollDataParser.SKIPPED_ROWS
+    for ii in range(participants):
+        responses = ENGLISH_RESPONSES if rnd.random() < english_share else GERMAN_RESPONSES
+        values = rnd.choices(responses, weights=RESPONSE_WEIGHTS, k=len(columns))
+        lines.append(
+            f'"Person {ii}",' + ",".join(f'"{value.value}"' for value in values) + ","
+        )
+    csv = "\n".join(lines) + "\n"
+    parsed = len(parse_poll_data(csv).participants)
+    if parsed != participants:
+        raise ValueError(
+            f"The generated poll has {parsed} instead of {participants} participants"
+        )
+    return csv
+
+
+def make_poll_configs(count: int, seed: int = 0) -> List[dict]:
+    """Generate the entries of a polls.yaml, alternating booth and poster polls"""
+    rnd = random.Random(seed)
+    configs = []
+    for ii in range(count):
+        config = {
+            "title": f"Aktion {ii}",
+            "description": f"Beschreibung der Aktion {ii}",
+            "poll_uri": f"bench{ii:011d}",
+            "signal_group_link": "https://signal.group/#benchmark",
+        }
+        if ii % 2 == 0:
+            config["poll_type"] = PollType.booth.value
+            config["minimum_staff"] = rnd.randint(1, 4)
+            config["total_workforce"] = rnd.randint(2, 8)
+        else:
+            config["poll_type"] = PollType.poster.value
+            config["person_hours"] = rnd.randint(10, 100)
+        configs.append(config)
+    return configs
+
+
+def write_polls_yaml(path: str, count: int, seed: int = 0) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        yaml.safe_dump(make_poll_configs(count, seed), f, allow_unicode=True)
@@ -0,0 +1,259 @@
+"""Time the stages of the pipeline for synthetic polls and compare them to a baseline
+
+    python -m benchmarks.run                    # run all scenarios
+    python -m benchmarks.run --save-baseline    # store the results as new baseline
+    python -m benchmarks.run -s large -r 10     # single scenario, more repetitions
+
+The baseline is machine-dependent and therefore not part of the repository. Save it
+on the machine the benchmarks are compared on, from a checkout of the reference
+revision (e.g. main), with --save-baseline; it is written to benchmarks/baseline.json
+or the path given by --baseline. Then run the benchmarks of the revision under test
+against it. The run fails if a stage got slower, or the peak memory grew, by more
+than the threshold, and also if the baseline lacks a scenario that was run.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import date, timedelta
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel
+
+from benchmarks.generator import make_poll_configs, make_poll_csv
+from benchmarks.stub_server import StubServer
+from core import FramadatePoll, PollDataParser, parse_poll_data
+from fetcher import PollFetcher
+from metrics import get_metrics
+from timeline import DEFAULT_DATA, EntryStore, render_entry, render_timeline
+
+STAGES = ("fetch", "parse", "tally", "build", "status", "render", "refresh")
+"""Measured stages; refresh is the incremental update after a few participants
+changed their responses"""
+DEFAULT_BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+DEFAULT_REPEAT = 5
+DEFAULT_THRESHOLD = 0.25
+"""Relative slowdown or memory growth that counts as regression"""
+NOISE_FLOOR = 0.001
+"""Absolute slowdown in seconds below which a stage never counts as regression"""
+
+
+class Scenario(BaseModel):
+    name: str
+    participants: int
+    days: int
+    slots_per_day: int
+    english_share: float = 0.0
+    """Share of participants answering with the English responses"""
+    polls: int = 1
+    """Number of polls in the generated polls.yaml"""
+    changed_participants: int = 1
+    """Participants changing their responses before the refresh"""
+    delay: float = 0.0
+    """Delay of the stub server per request in seconds"""
+
+
+SCENARIOS = [
+    Scenario(name="small", participants=20, days=10, slots_per_day=3, polls=3),
+    Scenario(name="medium", participants=100, days=60, slots_per_day=4, polls=10),
+    Scenario(name="large", participants=300, days=120, slots_per_day=6, polls=20),
+    Scenario(
+        name="mixed", participants=100, days=60, slots_per_day=4, polls=10,
+        english_share=0.5,
+    ),
+]
+
+
+def _swap_responses(csv: str, participants: int) -> str:
+    """Flip the yes and no responses of the last participants"""
+    lines = csv.rstrip("\n").split("\n")
+    first = PollDataParser.HEADER_ROWS + PollDataParser.SKIPPED_ROWS
+    for ii in range(max(first, len(lines) - participants), len(lines)):
+        lines[ii] = (
+            lines[ii]
+            .replace('"Ja"', '"_"').replace('"Nein"', '"Ja"').replace('"_"', '"Nein"')
+            .replace('"Yes"', '"_"').replace('"No"', '"Yes"').replace('"_"', '"No"')
+        )
+    return "\n".join(lines) + "\n"
+
+
+def _run_once(
+        configs: List[dict], changed: Dict[str, str], base_url: str, today: date,
+        days: int,
+) -> Dict[str, float]:
+    metrics = get_metrics()
+    timings = {}
+    polls = [FramadatePoll(**config) for config in configs]
+
+    fetcher = PollFetcher(base_url)
+    start = time.perf_counter()
+    results = fetcher.fetch_results([poll.poll_uri for poll in polls])
+    timings["fetch"] = time.perf_counter() - start
+    fetcher.close()
+
+    start = time.perf_counter()
+    parsed = [parse_poll_data(result.text) for result in results]
+    timings["parse"] = time.perf_counter() - start
+
+    metrics.reset()
+    for poll, result, parsed_ in zip(polls, results, parsed):
+        poll.poll_data = result.text
+        poll.process_poll_data(parsed=parsed_, incremental=False)
+    recorded = metrics.snapshot()["timings"]
+    for stage in ("tally", "build", "status"):
+        timings[stage] = recorded[stage]["total"]
+
+    render_entry.cache_clear()
+    start = time.perf_counter()
+    entry_store = EntryStore(horizon=timedelta(days=days), max_entries=sys.maxsize)
+    for poll in polls:
+        entry_store.update_poll(poll)
+    render_timeline(
+        {**DEFAULT_DATA, "loading": False},
+        ((entry.id, entry.html) for entry in entry_store.entries(today)),
+        revision=0,
+    )
+    timings["render"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for poll in polls:
+        poll.set_poll_data(changed[poll.poll_uri])
+    timings["refresh"] = time.perf_counter() - start
+    return timings
+
+
+def run_scenario(scenario: Scenario, repeat: int = DEFAULT_REPEAT) -> dict:
+    """Median duration of every stage over the repetitions, and the peak memory
+    allocated by Python during one additional run"""
+    today = date.today()
+    configs = make_poll_configs(scenario.polls)
+    bodies = {
+        config["poll_uri"]: make_poll_csv(
+            participants=scenario.participants,
+            days=scenario.days,
+            slots_per_day=scenario.slots_per_day,
+            english_share=scenario.english_share,
+            start=today,
+            seed=ii,
+        )
+        for ii, config in enumerate(configs)
+    }
+    changed = {
+        poll_uri: _swap_responses(csv, scenario.changed_participants)
+        for poll_uri, csv in bodies.items()
+    }
+    metrics = get_metrics()
+    enabled, metrics.enabled = metrics.enabled, True
+    try:
+        with StubServer(bodies, delay=scenario.delay) as server:
+            args = (configs, changed, server.base_url, today, scenario.days)
+            _run_once(*args)  # warm up
+            runs = [_run_once(*args) for _ in range(repeat)]
+            tracemalloc.start()
+            _run_once(*args)
+            _, peak_memory = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+    finally:
+        metrics.enabled = enabled
+        metrics.reset()
+    return {
+        "stages": {
+            stage: statistics.median(run[stage] for run in runs) for stage in STAGES
+        },
+        "peak_memory": peak_memory,
+    }
+
+
+def find_regressions(
+        results: Dict[str, dict], baseline: Dict[str, dict], threshold: float
+) -> List[str]:
+    """Describe every stage and peak memory exceeding the baseline by more than the
+    threshold, for the scenarios present in both"""
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        for stage, seconds in result["stages"].items():
+            base = baseline[name]["stages"].get(stage)
+            if (
+                    base is not None and seconds > base * (1 + threshold)
+                    and seconds - base > NOISE_FLOOR
+            ):
+                regressions.append(
+                    f"{name}/{stage}: {seconds * 1000:.1f} ms "
+                    f"(baseline {base * 1000:.1f} ms)"
+                )
+        base_memory = baseline[name].get("peak_memory")
+        if base_memory and result["peak_memory"] > base_memory * (1 + threshold):
+            regressions.append(
+                f"{name}/peak_memory: {result['peak_memory'] / 2 ** 20:.1f} MiB "
+                f"(baseline {base_memory / 2 ** 20:.1f} MiB)"
+            )
+    return regressions
+
+
+def _print_result(name: str, result: dict) -> None:
+    stages = "  ".join(
+        f"{stage} {seconds * 1000:8.2f}" for stage, seconds in result["stages"].items()
+    )
+    print(f"{name:<8} {stages}  peak {result['peak_memory'] / 2 ** 20:7.1f} MiB")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument(
+        "-s", "--scenario", action="append", choices=[s.name for s in SCENARIOS],
+        help="scenario to run, may be repeated (default: all)",
+    )
+    parser.add_argument("-r", "--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE_PATH)
+    parser.add_argument(
+        "--save-baseline", action="store_true",
+        help="store the results as baseline instead of comparing them",
+    )
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    args = parser.parse_args(argv)
+
+    if not args.save_baseline and not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}, run with --save-baseline first")
+        sys.exit(2)
+    scenarios = [
+        scenario for scenario in SCENARIOS
+        if not args.scenario or scenario.name in args.scenario
+    ]
+    print("durations in ms")
+    results = {}
+    for scenario in scenarios:
+        results[scenario.name] = run_scenario(scenario, args.repeat)
+        _print_result(scenario.name, results[scenario.name])
+
+    if args.save_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, "r", encoding="utf-8") as f:
+                baseline = json.load(f)
+        baseline.update(results)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, indent=2)
+        print(f"Saved baseline to {args.baseline}")
+        return
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    missing = [name for name in results if name not in baseline]
+    if missing:
+        print(f"No baseline of {', '.join(missing)}, run with --save-baseline first")
+        sys.exit(2)
+    regressions = find_regressions(results, baseline, args.threshold)
+    if regressions:
+        print("Regressions beyond {:.0%}:".format(args.threshold))
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+    print("No regressions")
+
+
+if __name__ == "__main__":
+    main()
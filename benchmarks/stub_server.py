@@ -0,0 +1,98 @@
+import hashlib
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+from urllib.parse import parse_qs, urlparse
+
+
+class _Server(ThreadingHTTPServer):
+    # The default backlog of 5 drops connections of concurrent fetches, which are
+    #  then retried only after a second
+    request_queue_size = 128
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients that timed out close the connection before the response is sent
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class StubServer:
+    """Local stand-in for the Framadate csv export, serving the given bodies by poll
+    uri with ETags and an optional delay per request"""
+
+    def __init__(self, bodies: Dict[str, str], delay: float = 0.0):
+        self.bodies = bodies
+        self.delay = delay
+        self.statuses: Dict[str, List[int]] = {}
+        """Status codes to answer the next requests for a poll uri with, one per
+        request, before its body is served again"""
+        self.requests: Dict[str, int] = {}
+        """Number of requests per poll uri"""
+        self.max_active = 0
+        """Maximum number of requests handled at the same time"""
+        self._active = 0
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                poll_uri = parse_qs(urlparse(self.path).query).get("poll", [""])[0]
+                with stub._lock:
+                    stub.requests[poll_uri] = stub.requests.get(poll_uri, 0) + 1
+                    stub._active += 1
+                    stub.max_active = max(stub.max_active, stub._active)
+                    statuses = stub.statuses.get(poll_uri)
+                    status = statuses.pop(0) if statuses else None
+                try:
+                    self._respond(poll_uri, status)
+                finally:
+                    with stub._lock:
+                        stub._active -= 1
+
+            def _respond(self, poll_uri, status):
+                if stub.delay:
+                    time.sleep(stub.delay)
+                if status is not None:
+                    self.send_response(status)
+                    self.end_headers()
+                    return
+                if poll_uri not in stub.bodies:
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                body = stub.bodies[poll_uri].encode("utf-8")
+                etag = f'"{hashlib.blake2b(body, digest_size=8).hexdigest()}"'
+                if self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "text/csv; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("ETag", etag)
+                self.end_headers()
+                self.wfile.write(body)
+
+        self._server = _Server(("127.0.0.1", 0), Handler)
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name="stub-server", daemon=True
+        )
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self) -> "StubServer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
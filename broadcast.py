@@ -0,0 +1,175 @@
+import asyncio
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, List, Optional, Tuple
+
+from cache import PollCache, get_poll_cache
+from poll_set import DEFAULT_RELOAD_PERIOD, PollSet, get_poll_set
+from scheduler import DEFAULT_TICK, RefreshScheduler, get_scheduler
+from timeline import EntryStore
+
+logger = logging.getLogger(__name__)
+
+EntryItems = List[Tuple[str, str]]
+"""(id, html) of the entries of a timeline, in order"""
+Subscriber = Callable[[EntryItems], None]
+
+
+class TimelineBroadcaster:
+    """Computes the timeline once per refresh and pushes it to all subscribers
+
+    Every open session subscribes its timeline when it connects and unsubscribes
+    when it is closed. A refresh fetches the polls through the shared poll cache,
+    updates a single EntryStore and passes the same entries to every subscriber, so
+    its cost does not grow with the number of viewers. A poll that fails to load
+    keeps its previous entries.
+
+    With a scheduler, only the polls due are fetched, within its budget, and the
+    other ones are read from the cache as they are, so every fetch of the process
+    goes through the scheduler. Refreshes requested while one is running join it
+    instead of starting another. A new subscriber receives the entries of the last
+    refresh right away.
+    """
+
+    def __init__(
+            self,
+            poll_set: Optional[PollSet] = None,
+            poll_cache: Optional[PollCache] = None,
+            entry_store: Optional[EntryStore] = None,
+            scheduler: Optional[RefreshScheduler] = None,
+    ):
+        self._poll_set = poll_set
+        self._poll_cache = poll_cache
+        self._scheduler = scheduler
+        self.entry_store = entry_store if entry_store is not None else EntryStore()
+        self.entries: Optional[EntryItems] = None
+        """Entries of the last refresh, None before the first one"""
+        self._subscribers: List[Subscriber] = []
+        self._lock = threading.Lock()
+        self._refreshing: Optional[asyncio.Task] = None
+        self._started = False
+
+    def __len__(self) -> int:
+        return len(self._subscribers)
+
+    def subscribe(self, subscriber: Subscriber) -> None:
+        """Push the entries of every refresh to the subscriber, starting with the
+        current ones"""
+        with self._lock:
+            self._subscribers.append(subscriber)
+            entries = self.entries
+        if entries is not None:
+            subscriber(entries)
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        with self._lock:
+            if subscriber in self._subscribers:
+                self._subscribers.remove(subscriber)
+
+    def publish(self, entries: EntryItems) -> None:
+        """Push the entries to all subscribers"""
+        with self._lock:
+            self.entries = entries
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber(entries)
+            except Exception as error:
+                logger.error("Pushing the timeline to %r failed: %r", subscriber, error)
+
+    def _get_poll_set(self) -> PollSet:
+        return self._poll_set if self._poll_set is not None else get_poll_set()
+
+    def _get_poll_cache(self) -> PollCache:
+        # An empty poll cache is falsy
+        return self._poll_cache if self._poll_cache is not None else get_poll_cache()
+
+    async def _refresh(self) -> None:
+        poll_set, poll_cache = self._get_poll_set(), self._get_poll_cache()
+        polls = poll_set.polls
+        self.entry_store.retain_polls(poll.poll_uri for poll in polls)
+        if self._scheduler is not None:
+            await self._scheduler.refresh_due(polls, poll_cache)
+        results = await poll_cache.aget_many(
+            polls, return_exceptions=True, fetch=self._scheduler is None
+        )
+        for poll, result in zip(polls, results):
+            if result is None:
+                # Neither fetched nor restored from a snapshot yet
+                continue
+            if isinstance(result, BaseException):
+                # Keep the entries of the poll as of its last successful fetch
+                logger.warning("Refreshing %s failed: %r", poll.poll_uri, result)
+                continue
+            self.entry_store.update_poll(result)
+        today = datetime.now().date()
+        self.publish(
+            [(entry.id, entry.html) for entry in self.entry_store.entries(today)]
+        )
+
+    async def refresh(self) -> None:
+        """Compute the entries and push them to all subscribers, joining a refresh
+        in progress"""
+        if self._refreshing is None or self._refreshing.done():
+            self._refreshing = asyncio.ensure_future(self._refresh())
+        await asyncio.shield(self._refreshing)
+
+
+    async def reload_polls(self) -> None:
+        """Apply changes of the yaml file of the polls, scheduling only the added and
+        changed polls for a fetch, and push the new timeline to all subscribers"""
+        change = self._get_poll_set().reload()
+        poll_cache = self._get_poll_cache()
+        for poll in change.changed:
+            poll_cache.invalidate(poll.poll_uri)
+            if self._scheduler is not None:
+                # Due right away, within the fetch budget
+                self._scheduler.forget(poll.poll_uri)
+        for poll_uri in change.removed:
+            poll_cache.invalidate(poll_uri)
+            if self._scheduler is not None:
+                self._scheduler.forget(poll_uri)
+        if change:
+            await self.refresh()
+
+    def start(
+            self,
+            tick: float = DEFAULT_TICK,
+            reload_period: float = DEFAULT_RELOAD_PERIOD,
+    ) -> None:
+        """Refresh the timelines every tick seconds and reload the polls every
+        reload_period seconds on the Panel server, scheduled once per process no
+        matter how often it is called
+
+        A single task per server process keeps the shared cache warm and computes
+        the timeline once for all sessions. Every poll is fetched on its own
+        schedule, more often the closer its next day and the more often it changed.
+        The tasks have to be scheduled from an importable module, as Panel refuses
+        callbacks defined in the served script.
+        """
+        # Only the dashboard server needs Panel
+        import panel
+
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        # Also drops the past days once the date changed
+        panel.state.schedule_task(
+            "refresh-timelines", self.refresh, period=timedelta(seconds=tick)
+        )
+        panel.state.schedule_task(
+            "reload-polls", self.reload_polls, period=timedelta(seconds=reload_period)
+        )
+
+
+_broadcaster: Optional[TimelineBroadcaster] = None
+
+
+def get_broadcaster() -> TimelineBroadcaster:
+    """Return the process-wide broadcaster, shared by all sessions"""
+    global _broadcaster
+    if _broadcaster is None:
+        _broadcaster = TimelineBroadcaster(scheduler=get_scheduler())
+    return _broadcaster
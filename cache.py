@@ -0,0 +1,283 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from pydantic import BaseModel
+
+from core import FramadatePoll, get_fetcher
+from fetcher import DEFAULT_CONCURRENCY
+from history import DEFAULT_HISTORY_PATH, HistoryStore
+from processing import PollProcessor
+from store import DEFAULT_SNAPSHOT_PATH, SnapshotStore
+
+DEFAULT_TTL = 300.0
+"""Seconds after which a cached poll is considered stale and fetched again"""
+DEFAULT_MAX_SIZE = 256
+"""Maximum number of cached polls, the least recently used ones are evicted first"""
+
+
+class CacheEntry(BaseModel):
+    poll: FramadatePoll
+    """Processed poll, shared by all sessions"""
+    fetched_at: float
+    """Monotonic time of the last successful fetch"""
+
+
+class PollCache:
+    """Process-wide cache of processed polls, keyed by poll_uri and shared by all
+    sessions of the app.
+
+    Entries expire after a TTL and the least recently used ones are evicted once the
+    cache is full. Concurrent requests for the same poll are coalesced into a single
+    fetch, which is processed off the event loop in a worker thread.
+
+    With a processor, the csv exports are parsed in its pool of workers instead of
+    while they are downloaded.
+
+    With a snapshot store, every fetch that changed the poll data is persisted and
+    polls missing from the cache are warm-started from their last snapshot in a
+    worker thread. If serve_stale is set, expired or
+    warm-started polls are returned right away while they are fetched again in the
+    background, so a slow or unavailable backend does not block the dashboard.
+
+    With a history store, the time slot tallies of every fetch that changed the poll
+    data are recorded.
+    """
+
+    def __init__(
+            self,
+            ttl: float = DEFAULT_TTL,
+            max_size: int = DEFAULT_MAX_SIZE,
+            workers: int = DEFAULT_CONCURRENCY,
+            store: Optional[SnapshotStore] = None,
+            serve_stale: bool = True,
+            processor: Optional[PollProcessor] = None,
+            history: Optional[HistoryStore] = None,
+    ):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.store = store
+        self.serve_stale = serve_stale
+        self.processor = processor
+        self.history = history
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._inflight: Dict[str, Future] = {}
+        self._generations: Dict[str, int] = {}
+        """Incremented by invalidate, so fetches started before it are not cached"""
+        self._epoch = 0
+        """Incremented when all polls are invalidated"""
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="poll-cache"
+        )
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, poll_uri: str) -> bool:
+        return poll_uri in self._entries
+
+    def _generation(self, poll_uri: str) -> Tuple[int, int]:
+        """Current generation of the poll, with the lock held"""
+        return self._epoch, self._generations.get(poll_uri, 0)
+
+    def _load(self, poll: FramadatePoll, generation: Tuple[int, int]) -> FramadatePoll:
+        try:
+            digest = poll.poll_data_digest
+            if self.processor is not None:
+                self.processor.process([poll])
+            else:
+                result = get_fetcher().fetch_results([poll.poll_uri])[0]
+                poll.apply_fetch_result(result)
+            poll.days  # process, if the poll was never processed before
+            stored = self._store(poll, time.monotonic(), generation)
+            # An invalidated poll may belong to a replaced configuration
+            if stored and poll.poll_data_digest != digest:
+                if self.store is not None:
+                    self.store.save(poll)
+                if self.history is not None:
+                    self.history.record(poll)
+        finally:
+            with self._lock:
+                if self._generation(poll.poll_uri) == generation:
+                    self._inflight.pop(poll.poll_uri, None)
+        return poll
+
+    def _store(
+            self, poll: FramadatePoll, fetched_at: float, generation: Tuple[int, int]
+    ) -> bool:
+        """Add the poll to the cache, unless it was invalidated since the given
+        generation. Returns whether it was added."""
+        with self._lock:
+            if self._generation(poll.poll_uri) != generation:
+                return False
+            self._insert(poll, fetched_at)
+            return True
+
+    def _insert(self, poll: FramadatePoll, fetched_at: float) -> None:
+        """Add the poll to the cache, with the lock held"""
+        self._entries[poll.poll_uri] = CacheEntry(poll=poll, fetched_at=fetched_at)
+        self._entries.move_to_end(poll.poll_uri)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def _restore(
+            self, poll: FramadatePoll, generation: Tuple[int, int]
+    ) -> FramadatePoll:
+        """Add the poll to the cache as expired entry, restored from its snapshot,
+        and fetch it. With serve_stale the restored poll is returned right away and
+        fetched in the background."""
+        try:
+            snapshot = self.store.restore(poll)
+        except Exception:
+            with self._lock:
+                if self._generation(poll.poll_uri) == generation:
+                    self._inflight.pop(poll.poll_uri, None)
+            raise
+        if snapshot is None:
+            return self._load(poll, generation)
+        if not self._store(poll, time.monotonic() - self.ttl, generation):
+            # Invalidated in the meantime
+            return poll
+        if not self.serve_stale:
+            return self._load(poll, generation)
+        with self._lock:
+            if self._generation(poll.poll_uri) == generation:
+                self._inflight[poll.poll_uri] = self._executor.submit(
+                    self._load, poll, generation
+                )
+        return poll
+
+    def _warm_start(
+            self, poll: FramadatePoll, generation: Tuple[int, int]
+    ) -> Optional[FramadatePoll]:
+        """Add the poll to the cache as expired entry, restored from its snapshot,
+        without fetching it"""
+        if self.store.restore(poll) is None:
+            return None
+        with self._lock:
+            entry = self._entries.get(poll.poll_uri)
+            if entry is not None:
+                # Fetched in the meantime
+                return entry.poll
+            if self._generation(poll.poll_uri) == generation:
+                self._insert(poll, fetched_at=time.monotonic() - self.ttl)
+        return poll
+
+    def _peek(self, poll: FramadatePoll) -> Future:
+        """Return a future of the cached poll regardless of its age, warm-started if
+        it is not cached, or of None if there is no snapshot of it either"""
+        with self._lock:
+            entry = self._entries.get(poll.poll_uri)
+            if entry is not None:
+                self._entries.move_to_end(poll.poll_uri)
+            generation = self._generation(poll.poll_uri)
+        if entry is None and self.store is not None:
+            return self._executor.submit(self._warm_start, poll, generation)
+        future = Future()
+        future.set_result(entry.poll if entry is not None else None)
+        return future
+
+    def _submit(self, poll: FramadatePoll, force: bool = False) -> Future:
+        """Return a future of the processed poll, either already resolved from the
+        cache, joining a fetch in flight or starting a new one"""
+        with self._lock:
+            entry = self._entries.get(poll.poll_uri)
+            generation = self._generation(poll.poll_uri)
+            fresh = (
+                entry is not None and not force
+                and time.monotonic() - entry.fetched_at < self.ttl
+            )
+            if fresh or (entry is not None and self.serve_stale and not force):
+                self._entries.move_to_end(poll.poll_uri)
+                if not fresh and poll.poll_uri not in self._inflight:
+                    # Revalidate in the background
+                    self._inflight[poll.poll_uri] = self._executor.submit(
+                        self._load, entry.poll, generation
+                    )
+                future = Future()
+                future.set_result(entry.poll)
+                return future
+            future = self._inflight.get(poll.poll_uri)
+            if future is None:
+                if entry is None and self.store is not None and not force:
+                    future = self._executor.submit(self._restore, poll, generation)
+                else:
+                    # The given instance replaces a cached one, e.g. after its
+                    #  configuration changed, instead of the other way round
+                    future = self._executor.submit(self._load, poll, generation)
+                self._inflight[poll.poll_uri] = future
+            return future
+
+    def get(self, poll: FramadatePoll) -> FramadatePoll:
+        """Return the processed poll with the poll_uri of the given one"""
+        return self._submit(poll).result()
+
+    async def aget(self, poll: FramadatePoll) -> FramadatePoll:
+        """Awaitable version of get"""
+        return await asyncio.wrap_future(self._submit(poll))
+
+    async def aget_many(
+            self,
+            polls: Iterable[FramadatePoll],
+            return_exceptions: bool = False,
+            fetch: bool = True,
+    ) -> List[Union[FramadatePoll, BaseException, None]]:
+        """Return the processed polls in the order of the input, and with
+        return_exceptions the exception of every failed poll instead of raising the
+        first one.
+
+        Without fetch, no poll is fetched or revalidated, leaving that to a
+        scheduler: cached polls are returned regardless of their age, missing ones
+        are warm-started from their snapshot, or None if there is none.
+        """
+        submit = self._submit if fetch else self._peek
+        return list(await asyncio.gather(
+            *(asyncio.wrap_future(submit(poll)) for poll in polls),
+            return_exceptions=return_exceptions,
+        ))
+
+    async def refresh(
+            self, polls: Optional[Iterable[FramadatePoll]] = None
+    ) -> List[Union[FramadatePoll, BaseException]]:
+        """Fetch the polls again, or all cached polls if None, regardless of their
+        age. Returns the processed polls, or the exception of a failed fetch, in the
+        order of the input."""
+        if polls is None:
+            with self._lock:
+                polls = [entry.poll for entry in self._entries.values()]
+        return await asyncio.gather(
+            *(asyncio.wrap_future(self._submit(poll, force=True)) for poll in polls),
+            return_exceptions=True,
+        )
+
+    def invalidate(self, poll_uri: Optional[str] = None) -> None:
+        """Drop a single poll, or all polls if no poll_uri is given. Fetches in
+        flight complete, but their polls are not cached."""
+        with self._lock:
+            if poll_uri is None:
+                self._entries.clear()
+                self._inflight.clear()
+                self._epoch += 1
+            else:
+                self._entries.pop(poll_uri, None)
+                self._inflight.pop(poll_uri, None)
+                self._generations[poll_uri] = self._generations.get(poll_uri, 0) + 1
+
+
+_poll_cache: Optional[PollCache] = None
+
+
+def get_poll_cache() -> PollCache:
+    """Return the process-wide poll cache"""
+    global _poll_cache
+    if _poll_cache is None:
+        _poll_cache = PollCache(
+            store=SnapshotStore(DEFAULT_SNAPSHOT_PATH),
+            processor=PollProcessor(),
+            history=HistoryStore(DEFAULT_HISTORY_PATH),
+        )
+    return _poll_cache
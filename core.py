@@ -1,24 +1,37 @@
+import numpy as np
 import pandas as pd
-from io import BytesIO
+import codecs
+import contextlib
+import csv
+import functools
+import logging
+import math
+import re
+import threading
 
-import requests
 from pydantic import (
-    BaseModel, constr, field_validator, HttpUrl, model_validator, PrivateAttr,
+    BaseModel, constr, field_serializer, field_validator, HttpUrl, model_validator,
+    PrivateAttr,
 )
-from typing import List, Optional, Union
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
 from enum import Enum, StrEnum
 from datetime import datetime, timedelta
 
 from pydantic.types import date
 
+from fetcher import FetchResult, PollFetcher, content_digest
+from metrics import get_metrics, timed
+from status import (
+    BLUE, NO_STATUS, RED, YELLOW, StatusThresholds, aggregate, classify,
+)
+
+logger = logging.getLogger(__name__)
+
 DOMAIN = "nuudel.digitalcourage.de"
+POLLS_PATH = "data/polls.yaml"
 DEFAULT_DURATION = 1
 
 MAYBE_FACTOR = 0.5
-# Threshold for the status of the booth poll
-RED = 0.2
-YELLOW = 0.5
-BLUE = 0.8
 
 
 class Tag(BaseModel):
@@ -67,6 +80,188 @@ class ResponseFactor(Enum):
     UNTERVORBEHALT = MAYBE_FACTOR
 
 
+RESPONSE_VALUES = [response.value for response in Response]
+"""Raw cell values of the csv export; the index is the integer code of a response"""
+POSITIVE_RESPONSES = (Response.YES, Response.JA)
+MAYBE_RESPONSES = (Response.UNDERRESERVE, Response.UNTERVORBEHALT)
+EMPTY_RESPONSE = len(RESPONSE_VALUES)
+"""Code of an empty cell"""
+_POSITIVE_BY_CODE = np.array(
+    [r in POSITIVE_RESPONSES for r in Response] + [False], dtype=np.int32
+)
+_MAYBE_BY_CODE = np.array(
+    [r in MAYBE_RESPONSES for r in Response] + [False], dtype=np.int32
+)
+
+
+def encode_responses(values: np.ndarray) -> np.ndarray:
+    """Encode a participant x time slot matrix of raw cell values into the integer
+    codes of the Response enum, and empty cells into EMPTY_RESPONSE"""
+    codes = pd.Categorical(values.ravel(), categories=RESPONSE_VALUES + [""]).codes
+    if (codes < 0).any():
+        invalid = values.ravel()[np.flatnonzero(codes < 0)[0]]
+        raise ValueError(f"{invalid!r} is not a valid {Response.__name__}")
+    return codes.astype(np.int8).reshape(values.shape)
+
+
+def tally_responses(
+        codes: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Count positives, maybes, total and polled persons of all time slots of an
+    encoded response matrix at once"""
+    positives = _POSITIVE_BY_CODE[codes].sum(axis=0)
+    maybes = _MAYBE_BY_CODE[codes].sum(axis=0)
+    total = positives + maybes * MAYBE_FACTOR
+    polled = np.full(codes.shape[1], codes.shape[0])
+    return positives, maybes, total, polled
+
+
+class ParsedPollData(BaseModel):
+    """Result of parsing the csv export of a poll"""
+
+    columns: List[str]
+    """Column names of the time slots, "<date> <time>" """
+    participants: List[str]
+    """Participant names, in the row order of codes"""
+    codes: np.ndarray
+    """Participant x time slot matrix of the responses, encoded as Response codes"""
+    positives: np.ndarray
+    """Number of positive responses per time slot"""
+    maybes: np.ndarray
+    """Number of 'Under reserve' responses per time slot"""
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """Raw cell values as DataFrame, with the participant names in the first
+        column"""
+        df = pd.DataFrame(
+            np.array(RESPONSE_VALUES, dtype=object)[self.codes], columns=self.columns
+        )
+        df.insert(0, " ", self.participants)
+        return df
+
+
+def _complete_records_end(text: str) -> int:
+    """Position after the last line break that is not inside a quoted field"""
+    end = len(text)
+    while True:
+        end = text.rfind("\n", 0, end)
+        if end < 0:
+            return 0
+        if text.count('"', 0, end) % 2 == 0:
+            return end + 1
+
+
+def _iter_lines(text: str, end: int) -> Iterator[str]:
+    start = 0
+    while start < end:
+        stop = text.find("\n", start, end)
+        stop = end if stop < 0 else stop + 1
+        yield text[start:stop]
+        start = stop
+
+
+class PollDataParser:
+    """Streaming parser of the csv export of a Framadate poll
+
+    Feed the export chunk by chunk, e.g. straight from the response body, and close
+    the parser to obtain the parsed data. Rows are encoded and tallied per chunk,
+    while the export is still downloading, and only an incomplete record is kept
+    between chunks. The fetcher still returns the raw export as well, as it is kept
+    as the poll data.
+    """
+
+    HEADER_ROWS = 2
+    """Rows with the dates and the times of the time slots"""
+    SKIPPED_ROWS = 2
+    """Rows following the header, which are not part of the responses"""
+
+    def __init__(self, encoding: str = "utf-8"):
+        self._decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+        self._pending = ""
+        self._rows_read = 0
+        self._header: List[List[str]] = []
+        self._participants: List[str] = []
+        self._blocks: List[np.ndarray] = []
+        self._positives: Optional[np.ndarray] = None
+        self._maybes: Optional[np.ndarray] = None
+
+    def feed(self, chunk: Union[str, bytes]) -> None:
+        if isinstance(chunk, bytes):
+            chunk = self._decoder.decode(chunk)
+        text = self._pending + chunk if self._pending else chunk
+        end = _complete_records_end(text)
+        self._parse_records(_iter_lines(text, end))
+        self._pending = text[end:]
+
+    def _parse_records(self, lines: Iterable[str]) -> None:
+        block = []
+        for row in csv.reader(lines):
+            self._rows_read += 1
+            if len(self._header) < self.HEADER_ROWS:
+                self._header.append(row)
+                continue
+            if self._rows_read <= self.HEADER_ROWS + self.SKIPPED_ROWS or not row:
+                continue
+            width = len(self._header[0])
+            self._participants.append(row[0])
+            block.append((row[1:width] + [""] * (width - len(row)))[:width - 1])
+        if block:
+            codes = encode_responses(np.array(block, dtype=object))
+            positives, maybes, _, _ = tally_responses(codes)
+            self._blocks.append(codes)
+            if self._positives is None:
+                self._positives, self._maybes = positives, maybes
+            else:
+                self._positives += positives
+                self._maybes += maybes
+
+    def close(self) -> ParsedPollData:
+        self.feed(self._decoder.decode(b"", final=True))
+        if self._pending:
+            self._parse_records([self._pending])
+            self._pending = ""
+        if len(self._header) < self.HEADER_ROWS:
+            raise ValueError("The poll data lacks the header rows")
+        dates, times = self._header
+        times = times + [""] * (len(dates) - len(times))
+        columns = [f"{date_} {time_}" for date_, time_ in zip(dates[1:], times[1:])]
+        if self._blocks:
+            codes = np.concatenate(self._blocks)
+            positives, maybes = self._positives, self._maybes
+        else:
+            codes = np.empty((0, len(columns)), dtype=np.int8)
+            positives = maybes = np.zeros(len(columns), dtype=np.int32)
+        # Drop columns without any response, such as the one after the trailing comma
+        answered = (codes != EMPTY_RESPONSE).any(axis=0)
+        if not answered.all():
+            codes = codes[:, answered]
+            positives, maybes = positives[answered], maybes[answered]
+            columns = [column for column, kept in zip(columns, answered) if kept]
+        if (codes == EMPTY_RESPONSE).any():
+            row, column = np.argwhere(codes == EMPTY_RESPONSE)[0]
+            raise ValueError(
+                f"Missing response of {self._participants[row]!r} for {columns[column]!r}"
+            )
+        return ParsedPollData(
+            columns=columns,
+            participants=self._participants,
+            codes=codes,
+            positives=positives,
+            maybes=maybes,
+        )
+
+
+def parse_poll_data(data: Union[str, Iterable[Union[str, bytes]]]) -> ParsedPollData:
+    """Parse the csv export of a poll, given as a whole or as iterable of chunks"""
+    parser = PollDataParser()
+    for chunk in [data] if isinstance(data, str) else data:
+        parser.feed(chunk)
+    return parser.close()
+
+
 class PolledTimeSlot(BaseModel):
     string: str
     """Column name of the poll data, corresponding to a time slot"""
@@ -122,10 +317,206 @@ class PolledTimeSlot(BaseModel):
         if self.end_time is not None:
             self.calculate_duration()
 
+STATUSES = list(Status)
+"""Status enum members; the index is the status code used in TimeSlotTable and by
+the status engine"""
+_TIME_PATTERN = re.compile(r"(\d{2}):(\d{2})")
+
+
+def _parse_minutes(time_: str) -> int:
+    match = _TIME_PATTERN.fullmatch(time_)
+    if match is None:
+        raise ValueError(f"{time_!r} is not a valid time of the format HH:MM")
+    return int(match.group(1)) * 60 + int(match.group(2))
+
+
+def _format_minutes(minutes: int) -> str:
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+class TimeSlotTable:
+    """Columnar storage of all time slots of a poll
+
+    Every attribute of a PolledTimeSlot is kept in one NumPy array with an entry per
+    time slot, in the column order of the poll data. Times are stored as minutes
+    after midnight and the status as index into STATUSES.
+    """
+
+    def __init__(
+            self,
+            strings: List[str],
+            positives: np.ndarray,
+            maybes: np.ndarray,
+            total: np.ndarray,
+            polled: np.ndarray,
+    ):
+        self.strings = list(strings)
+        date_parts, start_minutes = [], []
+        for string in self.strings:
+            date_part, times = string.split(" ")[:2]
+            date_parts.append(date_part)
+            # An explicit end time is superseded by the start of the next time slot
+            start_minutes.append(_parse_minutes(times.split("-")[0]))
+        self.date = np.array(date_parts, dtype="datetime64[D]")
+        self.start = np.array(start_minutes, dtype=np.int16)
+        self.end = np.empty(len(self.strings), dtype=np.int16)
+        self.duration = np.empty(len(self.strings), dtype=np.float64)
+        self.positives = np.asarray(positives, dtype=np.int32).copy()
+        self.maybes = np.asarray(maybes, dtype=np.int32).copy()
+        self.total = np.asarray(total, dtype=np.float64).copy()
+        self.polled = np.asarray(polled, dtype=np.int32).copy()
+        self.status = np.full(len(self.strings), NO_STATUS, dtype=np.int8)
+        # Number the days in the order of their first appearance
+        _, first_index, inverse = np.unique(
+            self.date, return_index=True, return_inverse=True
+        )
+        self.day_index = np.argsort(np.argsort(first_index))[inverse]
+        """Index of the day of every time slot"""
+        self._calculate_end_times()
+
+    def __len__(self) -> int:
+        return len(self.strings)
+
+    def _calculate_end_times(self) -> None:
+        """Let every time slot end with the start of the next time slot of its day,
+        and the last time slot of a day last DEFAULT_DURATION hours"""
+        order = np.argsort(self.day_index, kind="stable")
+        is_last = np.ones(len(order), dtype=bool)
+        is_last[:-1] = self.day_index[order[1:]] != self.day_index[order[:-1]]
+        following = order[np.minimum(np.arange(1, len(order) + 1), len(order) - 1)]
+        end = np.where(
+            is_last,
+            (self.start[order] + DEFAULT_DURATION * 60) % (24 * 60),
+            self.start[following],
+        )
+        self.end[order] = end
+        self.duration[order] = np.where(
+            is_last,
+            DEFAULT_DURATION,
+            ((end - self.start[order]) % (24 * 60)) / 60,
+        )
+
+    def day_groups(self) -> List[Tuple[date, np.ndarray]]:
+        """Date and time slot indices of every day, in order of their appearance"""
+        order = np.argsort(self.day_index, kind="stable")
+        bounds = np.flatnonzero(np.diff(self.day_index[order])) + 1
+        return [
+            (self.date[indices[0]].item(), indices)
+            for indices in np.split(order, bounds) if len(indices)
+        ]
+
+    def views(self) -> List["TimeSlotView"]:
+        return [TimeSlotView(self, ii) for ii in range(len(self))]
+
+
+class TimeSlotView:
+    """Lightweight, PolledTimeSlot compatible view of a single row of a
+    TimeSlotTable"""
+
+    __slots__ = ("_table", "_index")
+
+    def __init__(self, table: TimeSlotTable, index: int):
+        self._table = table
+        self._index = index
+
+    def __repr__(self) -> str:
+        return f"TimeSlotView({self.string!r}, total={self.total})"
+
+    @property
+    def string(self) -> str:
+        return self._table.strings[self._index]
+
+    @property
+    def polled(self) -> int:
+        return int(self._table.polled[self._index])
+
+    @polled.setter
+    def polled(self, value: int):
+        self._table.polled[self._index] = value
+
+    @property
+    def positives(self) -> int:
+        return int(self._table.positives[self._index])
+
+    @positives.setter
+    def positives(self, value: int):
+        self._table.positives[self._index] = value
+
+    @property
+    def maybes(self) -> int:
+        return int(self._table.maybes[self._index])
+
+    @maybes.setter
+    def maybes(self, value: int):
+        self._table.maybes[self._index] = value
+
+    @property
+    def total(self) -> float:
+        return float(self._table.total[self._index])
+
+    @total.setter
+    def total(self, value: float):
+        self._table.total[self._index] = value
+
+    @property
+    def status(self) -> Optional[Status]:
+        code = self._table.status[self._index]
+        return None if code == NO_STATUS else STATUSES[code]
+
+    @status.setter
+    def status(self, value: Optional[Status]):
+        self._table.status[self._index] = (
+            NO_STATUS if value is None else STATUSES.index(value)
+        )
+
+    @property
+    def date(self) -> date:
+        return self._table.date[self._index].item()
+
+    @property
+    def start_time(self) -> str:
+        return _format_minutes(int(self._table.start[self._index]))
+
+    @property
+    def end_time(self) -> str:
+        return _format_minutes(int(self._table.end[self._index]))
+
+    @property
+    def duration(self) -> float:
+        return float(self._table.duration[self._index])
+
+    def set_end_time(self, value: str):
+        self._table.end[self._index] = _parse_minutes(value)
+        self.calculate_duration()
+
+    def set_duration(self, value: float):
+        self._table.duration[self._index] = value
+        self._table.end[self._index] = (
+            self._table.start[self._index] + round(value * 60)
+        ) % (24 * 60)
+
+    def calculate_duration(self):
+        self._table.duration[self._index] = (
+            (self._table.end[self._index] - self._table.start[self._index]) % (24 * 60)
+        ) / 60
+
+    def model_dump(self) -> dict:
+        return {
+            field: getattr(self, field) for field in PolledTimeSlot.model_fields
+        }
+
+
+DAY_FIELDS_FROM_POLL = (
+    "poll_uri", "poll_url", "title", "description", "poll_type", "signal_group_link",
+    "sub_tasks", "status",
+)
+"""Fields of a FramadatePoll that are shared with its days"""
+
+
 class PolledDay(BaseModel):
     title: str
     date: date
-    time_slots: List[PolledTimeSlot]
+    time_slots: List[Union[PolledTimeSlot, TimeSlotView]]
     status: Optional[Status] = None
     poll_url: Optional[HttpUrl] = None
     signal_group_link: Optional[HttpUrl] = None
@@ -137,7 +528,41 @@ class PolledDay(BaseModel):
 
     def __init__(self, **data):
         super().__init__(**data)
+        self._link_time_slots()
+
+    @classmethod
+    def from_poll(
+            cls,
+            poll: "FramadatePoll",
+            date_: date,
+            time_slots: List[Union[PolledTimeSlot, TimeSlotView]],
+    ) -> "PolledDay":
+        """Create a day of the poll without serializing and validating the poll. The
+        poll-level metadata is shared by reference."""
+        day = cls.model_construct(
+            date=date_,
+            time_slots=time_slots,
+            **{field: getattr(poll, field) for field in DAY_FIELDS_FROM_POLL},
+        )
+        day._link_time_slots()
+        return day
+
+    @field_serializer("time_slots")
+    def serialize_time_slots(
+            self, time_slots: List[Union[PolledTimeSlot, TimeSlotView]]
+    ) -> list:
+        """Dump table-backed time slots like PolledTimeSlot models"""
+        return [
+            time_slot.model_dump() if isinstance(time_slot, TimeSlotView) else time_slot
+            for time_slot in time_slots
+        ]
+
+    def _link_time_slots(self):
+        """Let every time slot end with the start of the next one"""
         for ii, time_slot in enumerate(self.time_slots):
+            if isinstance(time_slot, TimeSlotView):
+                # End times of table-backed time slots are set by the table already
+                continue
             if ii == len(self.time_slots) - 1:
                 time_slot.set_duration(DEFAULT_DURATION)
             else:
@@ -169,11 +594,148 @@ class Task(BaseModel):
         arbitrary_types_allowed = True
 
 
+def _locked(method):
+    """Run the method of a FramadatePoll while holding the lock of the poll"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
 class PollType(StrEnum):
     booth = "Infostand"
     poster = "Plakatieren"
 
 
+def status_decision(
+        target: Union[PolledTimeSlot, PolledDay, "FramadatePoll"],
+        nominator: float,
+        denominator: float,
+        thresholds: Optional[StatusThresholds] = None,
+):
+    thresholds = thresholds or StatusThresholds()
+    if any([nominator is None, denominator is None]):
+        target.status = Status.UNDERSTAFFED
+    else:
+        # Division by zero like in status.classify: x / 0 is full, 0 / 0 is missing
+        if denominator == 0:
+            ratio = math.inf if nominator > 0 else math.nan
+        else:
+            ratio = nominator / denominator
+        match ratio:
+            case x if x < thresholds.yellow:  # RED
+                target.status = Status.UNDERSTAFFED
+            case x if x < thresholds.blue:  # YELLOW
+                target.status = Status.HALF_STAFFED
+            case x if x >= thresholds.blue:  # BLUE
+                target.status = Status.FULL_STAFFED
+            case _:  # todo: revisit this
+                target.status = Status.UNDERSTAFFED
+
+
+def aggregated_status_decision(target: Union[PolledDay, "FramadatePoll"], list_: list):
+    if all(list_ele.status == Status.FULL_STAFFED for list_ele in list_):
+        target.status = Status.FULL_STAFFED
+    elif all(list_ele.status == Status.HALF_STAFFED for list_ele in list_):
+        target.status = Status.HALF_STAFFED
+    elif any(list_ele.status == Status.UNDERSTAFFED for list_ele in list_):
+        target.status = Status.UNDERSTAFFED
+    elif (
+            any(list_ele.status == Status.HALF_STAFFED for list_ele in list_)
+            and not
+            any(list_ele.status == Status.UNDERSTAFFED for list_ele in list_)
+    ):
+        target.status = Status.HALF_STAFFED
+    else:  # todo: revisit this
+        target.status = Status.UNDERSTAFFED
+
+
+def _participant_keys(participants: List[str]) -> List[Tuple[str, int]]:
+    """Make participant names unique by numbering repeated names"""
+    seen = {}
+    keys = []
+    for name in participants:
+        seen[name] = seen.get(name, -1) + 1
+        keys.append((name, seen[name]))
+    return keys
+
+
+def diff_response_rows(
+        old_participants: List[str],
+        old_codes: np.ndarray,
+        new_participants: List[str],
+        new_codes: np.ndarray,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Compare two encoded response matrices with the same time slots by participant
+
+    Returns:
+        Row indices into new_codes of added or changed participants and row indices
+        into old_codes of removed or changed participants.
+    """
+    old_rows = {key: ii for ii, key in enumerate(_participant_keys(old_participants))}
+    added, common_new, common_old = [], [], []
+    for ii, key in enumerate(_participant_keys(new_participants)):
+        jj = old_rows.pop(key, None)
+        if jj is None:
+            added.append(ii)
+        else:
+            common_new.append(ii)
+            common_old.append(jj)
+    removed = list(old_rows.values())
+    common_new = np.array(common_new, dtype=np.intp)
+    common_old = np.array(common_old, dtype=np.intp)
+    changed = (new_codes[common_new] != old_codes[common_old]).any(axis=1)
+    return (
+        np.concatenate([np.array(added, dtype=np.intp), common_new[changed]]),
+        np.concatenate([np.array(removed, dtype=np.intp), common_old[changed]]),
+    )
+
+
+class ResponseIndex:
+    """Lookup structures over the encoded response matrix of a poll
+
+    The rows of every participant, the columns of every time slot and the time slots
+    of every date are mapped up front, and the responses are kept as boolean
+    participant x time slot matrices. Queries therefore only touch the rows and
+    columns involved instead of scanning the poll data.
+    """
+
+    def __init__(
+            self,
+            participants: List[str],
+            columns: List[str],
+            codes: np.ndarray,
+            dates: List[date],
+            day_of_slot: np.ndarray,
+    ):
+        self.participants = participants
+        self.codes = codes
+        self.positive = _POSITIVE_BY_CODE[codes].astype(bool)
+        """Participant x time slot matrix of positive responses"""
+        self.available = self.positive | _MAYBE_BY_CODE[codes].astype(bool)
+        """Participant x time slot matrix of positive and maybe responses"""
+        rows = {}
+        for ii, name in enumerate(participants):
+            rows.setdefault(name, []).append(ii)
+        self.rows: Dict[str, np.ndarray] = {
+            name: np.array(indices, dtype=np.intp) for name, indices in rows.items()
+        }
+        """Row indices by participant name, several if the name is repeated"""
+        self.column_of: Dict[str, int] = {
+            column: ii for ii, column in enumerate(columns)
+        }
+        order = np.argsort(day_of_slot, kind="stable")
+        bounds = np.searchsorted(day_of_slot[order], np.arange(len(dates) + 1))
+        self.slots_by_date: Dict[date, np.ndarray] = {
+            date_: order[bounds[ii]:bounds[ii + 1]] for ii, date_ in enumerate(dates)
+        }
+        """Time slot indices by date, in column order"""
+
+    def responses(self, include_maybe: bool = True) -> np.ndarray:
+        return self.available if include_maybe else self.positive
+
+
 class FramadatePoll(BaseModel):
     poll_uri: Optional[str] = None
     poll_url: Optional[HttpUrl] = None
@@ -185,12 +747,30 @@ class FramadatePoll(BaseModel):
     sub_tasks: Optional[List[Task]] = None
     poll_data: Optional[str] = None
     """Raw data of the poll"""
+    _lock: threading.RLock = PrivateAttr(default_factory=threading.RLock)
+    """Held while the poll data is processed, see lock"""
+    _poll_data_digest: Optional[str] = PrivateAttr(default=None)
+    """Content hash of the poll data the current state was processed from"""
     _poll_data_df: Optional[pd.DataFrame] = PrivateAttr(default=None)
-    """DataFrame of the poll data"""
-    _time_slots: Optional[List[PolledTimeSlot]] = PrivateAttr(default=None)
+    """DataFrame of the poll data, only used by the per-cell reference implementation"""
+    _columns: Optional[List[str]] = PrivateAttr(default=None)
+    """Column names of the time slots"""
+    _response_codes: Optional[np.ndarray] = PrivateAttr(default=None)
+    """Participant x time slot matrix of the responses, encoded as Response codes"""
+    _participants: Optional[List[str]] = PrivateAttr(default=None)
+    """Participant names, in the row order of the response matrix"""
+    _day_of_slot: Optional[np.ndarray] = PrivateAttr(default=None)
+    """Index into the list of days for every time slot"""
+    _time_slots: Optional[List[Union[PolledTimeSlot, TimeSlotView]]] = PrivateAttr(
+        default=None
+    )
+    _slot_table: Optional[TimeSlotTable] = PrivateAttr(default=None)
+    """Columnar storage behind the time slots, unless processed per cell"""
     _participation_df: Optional[pd.DataFrame] = PrivateAttr(default=None)
     _days: Optional[List[PolledDay]] = PrivateAttr(default=None)
     """List of days with the participation data - to be casted into timeline entries"""
+    _response_index: Optional[ResponseIndex] = PrivateAttr(default=None)
+    """Built on the first query after processing the poll data"""
     total_workforce: Optional[float] = None
     """Sum of estimated workforce over all days"""
     person_hours: Optional[float] = None
@@ -202,6 +782,8 @@ class FramadatePoll(BaseModel):
     """Persons required for every time slot of the poll"""
     status: Optional[Status] = None
     """Status of the poll"""
+    thresholds: Optional[StatusThresholds] = None
+    """Staffing ratios separating the statuses, RED, YELLOW and BLUE if None"""
 
     class Config:
         arbitrary_types_allowed = True
@@ -217,16 +799,29 @@ class FramadatePoll(BaseModel):
             raise ValueError("Either poll_uri or poll_url must be set")
         return values
 
-    def __init__(self, **data):
-        super().__init__(**data)
-        if self.poll_data is None:
-            self.fetch_poll_data()
-        self.process_poll_data()
+    # Construction is free of network access and processing: the poll data is fetched
+    #  and processed on first access of the days
+
+    @property
+    def lock(self) -> threading.RLock:
+        """Lock held while the poll data is processed. Hold it to read the digest,
+        days and time slots of a poll that is shared between threads in a
+        consistent state, as incremental updates change them in place."""
+        return self._lock
+
+    @property
+    def poll_data_digest(self) -> Optional[str]:
+        """Content hash of the poll data the current state was processed from"""
+        return self._poll_data_digest
+
+    @property
+    def is_loaded(self) -> bool:
+        """Whether the poll data was processed into days already"""
+        return self._days is not None
 
     def fetch_poll_data(self):
         # Todo: why does ths return a german doc?
-        # self.poll_data = asyncio.run(async_fetch_polls_data([self]))[0]
-        self.poll_data = requests.get(f"https://{DOMAIN}/exportcsv.php?poll={self.poll_uri}").text
+        self.poll_data = get_fetcher().fetch([self.poll_uri])[0]
 
     def get_poll_data(self) -> str:
         if self.poll_data is None:
@@ -236,60 +831,148 @@ class FramadatePoll(BaseModel):
     @property
     def days(self) -> List[PolledDay]:
         if self._days is None:
-            self.process_poll_data()
+            with self._lock:
+                if self._days is None:
+                    self.process_poll_data()
         return self._days
 
-    def set_poll_data(self, data: str):
+    @_locked
+    def set_poll_data(
+            self,
+            data: str,
+            digest: Optional[str] = None,
+            parsed: Optional[ParsedPollData] = None,
+    ):
+        """Set new poll data and process it, unless it is identical to the data the
+        current time slots and days were processed from"""
+        if digest is None:
+            digest = content_digest(data)
         self.poll_data = data
-        self.process_poll_data()
+        if digest == self._poll_data_digest and self._days is not None:
+            return
+        self.process_poll_data(parsed=parsed, digest=digest)
+
+    def apply_fetch_result(self, result: FetchResult):
+        self.set_poll_data(result.text, digest=result.digest, parsed=result.parsed)
 
     def update(self):
-        self.fetch_poll_data()
-        self.process_poll_data()
+        self.apply_fetch_result(get_fetcher().fetch_results([self.poll_uri])[0])
 
-    def process_poll_data(self) -> None:
-        """Process the poll data to generate the participation data"""
-        if self.poll_data is None:
-            self.fetch_poll_data()
+    @property
+    def response_index(self) -> ResponseIndex:
+        """Index of the responses, processing the poll data if necessary"""
+        if self._response_index is None:
+            days = self.days
+            self._response_index = ResponseIndex(
+                self._participants,
+                self._columns,
+                self._response_codes,
+                [day.date for day in days],
+                self._day_of_slot,
+            )
+        return self._response_index
+
+    def slots_of_participant(
+            self, name: str, include_maybe: bool = True
+    ) -> List[Union[PolledTimeSlot, TimeSlotView]]:
+        """Time slots the participant signed up for, e.g. for a "my shifts" view"""
+        index = self.response_index
+        rows = index.rows.get(name)
+        if rows is None:
+            return []
+        slots = np.flatnonzero(index.responses(include_maybe)[rows].any(axis=0))
+        time_slots = self._time_slots
+        return [time_slots[ii] for ii in slots]
 
-        self._time_slots = []
+    def participants_available(
+            self, date_: date, include_maybe: bool = True
+    ) -> List[str]:
+        """Participants available in at least one time slot of the date"""
+        index = self.response_index
+        slots = index.slots_by_date.get(date_)
+        if slots is None:
+            return []
+        rows = np.flatnonzero(index.responses(include_maybe)[:, slots].any(axis=1))
+        return [index.participants[ii] for ii in rows]
+
+    def participants_of_slot(self, string: str, include_maybe: bool = True) -> List[str]:
+        """Participants available in the time slot with the given column name"""
+        index = self.response_index
+        column = index.column_of.get(string)
+        if column is None:
+            return []
+        rows = np.flatnonzero(index.responses(include_maybe)[:, column])
+        return [index.participants[ii] for ii in rows]
+
+    def slots_short_of_staff(
+            self, missing: float = 1
+    ) -> List[Union[PolledTimeSlot, TimeSlotView]]:
+        """Time slots whose total lacks at most the given number of persons to reach
+        the minimum staff. Empty if the poll has no minimum staff."""
+        if self.minimum_staff is None:
+            return []
+        self.days
+        if self._slot_table is not None:
+            total = self._slot_table.total
+        else:
+            total = np.array([time_slot.total for time_slot in self._time_slots])
+        lack = self.minimum_staff - total
+        slots = np.flatnonzero((lack > 0) & (lack <= missing))
+        time_slots = self._time_slots
+        return [time_slots[ii] for ii in slots]
+
+    def response_of(self, name: str, string: str) -> Optional[Response]:
+        """Response of the participant in the time slot, the first one for repeated
+        names. None if the participant, the time slot or the response is missing."""
+        index = self.response_index
+        rows = index.rows.get(name)
+        column = index.column_of.get(string)
+        if rows is None or column is None:
+            return None
+        code = index.codes[rows[0], column]
+        return Response(RESPONSE_VALUES[code]) if code < EMPTY_RESPONSE else None
+
+    @timed("tally")
+    def _tally_time_slots(self, parsed: ParsedPollData) -> List[TimeSlotView]:
+        """Build the time slots from the tallies of the parsed poll data"""
+        self._slot_table = TimeSlotTable(
+            parsed.columns,
+            parsed.positives,
+            parsed.maybes,
+            parsed.positives + parsed.maybes * MAYBE_FACTOR,
+            np.full(len(parsed.columns), len(parsed.participants)),
+        )
+        return self._slot_table.views()
+
+    @timed("tally")
+    def _tally_time_slots_per_cell(self) -> List[PolledTimeSlot]:
+        """Reference implementation of _tally_time_slots, converting every cell into
+        a Response and counting the responses column by column"""
+        time_slots = []
         # For each cell in the poll data, except the cells of the first column,
         #  which are the names of the participants, try to replace the cells value
         #  with one of the Response enum values. If the cell value is not in the
         #  Response enum, raise an error.
-        io_obj = BytesIO(self.poll_data.encode("utf-8"))
-        # Process the first two lines of the csv file to generate proper column names
-        first_line = io_obj.readline().decode("utf-8")
-        second_line = io_obj.readline().decode("utf-8")
-        fl_parts = [string.strip('"') for string in  first_line.split(",")]
-        sl_parts = [string.strip('"') for string in  second_line.split(",")]
-        column_names = [
-            f"{fl_part} {sl_part}" for (fl_part, sl_part) in zip(fl_parts, sl_parts)
-        ]
-        # Read the csv file into a pandas DataFrame
-        self._poll_data_df = pd.read_csv(io_obj, skiprows=2, names=column_names)
-        # Remove empty columns (with solely NaN values)
-        self._poll_data_df.dropna(axis=1, how="all", inplace=True)
-        # Replace the values of the cells with the corresponding Response enum value
-        for column in self._poll_data_df.columns[1:]:
-            self._poll_data_df[column] = self._poll_data_df[column].map(
+        responses_df = self._poll_data_df.copy()
+        for column in responses_df.columns[1:]:
+            responses_df[column] = responses_df[column].map(
                 lambda x: Response(x)
             )
         # Estimate the participation for each time slot
-        for column in self._poll_data_df.columns[1:]:
+        for column in responses_df.columns[1:]:
             positives = (
-                self._poll_data_df[column].value_counts().get(Response.JA, 0) +
-                self._poll_data_df[column].value_counts().get(Response.YES, 0)
+                responses_df[column].value_counts().get(Response.JA, 0) +
+                responses_df[column].value_counts().get(Response.YES, 0)
             )
             maybes = (
-                self._poll_data_df[column].value_counts().get(
+                responses_df[column].value_counts().get(
                     Response.UNTERVORBEHALT, 0) +
-                self._poll_data_df[column].value_counts().get(
+                responses_df[column].value_counts().get(
                     Response.UNDERRESERVE, 0)
             )
             total = positives + maybes * MAYBE_FACTOR
-            polled = len(self._poll_data_df[column])
-            self._time_slots.append(
+            polled = len(responses_df[column])
+            time_slots.append(
                 PolledTimeSlot(
                     string=column,
                     positives=positives,
@@ -298,55 +981,171 @@ class FramadatePoll(BaseModel):
                     polled=polled,
                 )
             )
-        # Group time_slots by day
-        days = {}
-        for time_slot in self._time_slots:
-            if time_slot.date in days:
-                days[time_slot.date].append(time_slot)
-            else:
-                days[time_slot.date] = [time_slot]
-        self._days = []
-        for date_, time_slots in days.items():
-            self._days.append(
-                PolledDay(date=date_, time_slots=time_slots, **self.model_dump())
+        return time_slots
+
+    @_locked
+    def process_poll_data(
+            self,
+            vectorized: bool = True,
+            incremental: bool = True,
+            parsed: Optional[ParsedPollData] = None,
+            digest: Optional[str] = None,
+    ) -> None:
+        """Process the poll data to generate the participation data
+
+        Args:
+            vectorized: Tally the responses and decide the statuses of all time slots
+                at once. Disable to use the per-cell reference implementation.
+            incremental: If the time slots of the poll did not change since the last
+                processing, only apply the responses of changed participants to the
+                existing time slots and re-evaluate the statuses.
+            parsed: The poll data, if it was parsed already while streaming it
+            digest: Content hash of the poll data, if it is known already
+        """
+        if parsed is None:
+            if self.poll_data is None:
+                self.fetch_poll_data()
+            with get_metrics().timer("parse"):
+                parsed = parse_poll_data(self.poll_data)
+
+        get_metrics().increment("polls_processed")
+        self._poll_data_digest = (
+            digest if digest is not None else content_digest(self.poll_data)
+        )
+        previous_columns = self._columns
+        previous_participants = self._participants
+        previous_codes = self._response_codes
+        self._columns = parsed.columns
+        self._participants = parsed.participants
+        self._response_codes = parsed.codes
+        self._response_index = None
+        if (
+                incremental and vectorized
+                and self._days is not None and previous_codes is not None
+                and previous_columns == self._columns
+        ):
+            self._update_incrementally(previous_participants, previous_codes)
+            return
+        if vectorized:
+            self._time_slots = self._tally_time_slots(parsed)
+        else:
+            self._slot_table = None
+            self._poll_data_df = parsed.to_dataframe()
+            self._time_slots = self._tally_time_slots_per_cell()
+        self._group_days()
+        if vectorized:
+            self._decide_status()
+        else:
+            self._decide_status_per_day()
+
+    @timed("build")
+    def _group_days(self) -> None:
+        """Group the time slots by day"""
+        if self._slot_table is not None:
+            groups = [
+                (date_, [self._time_slots[ii] for ii in indices])
+                for date_, indices in self._slot_table.day_groups()
+            ]
+            day_of_slot = self._slot_table.day_index
+        else:
+            days = {}
+            for time_slot in self._time_slots:
+                if time_slot.date in days:
+                    days[time_slot.date].append(time_slot)
+                else:
+                    days[time_slot.date] = [time_slot]
+            groups = list(days.items())
+            day_numbers = {date_: ii for ii, date_ in enumerate(days)}
+            day_of_slot = np.array(
+                [day_numbers[time_slot.date] for time_slot in self._time_slots],
+                dtype=np.intp,
             )
+        polled_days = [
+            PolledDay.from_poll(self, date_, time_slots) for date_, time_slots in groups
+        ]
+        self._day_of_slot = day_of_slot
+        self._days = polled_days
+        get_metrics().increment("slots", len(self._time_slots))
+        get_metrics().increment("days", len(polled_days))
 
-        def status_decision(target: Union[PolledTimeSlot, PolledDay], nominator: float, denominator: float):
-            if any([nominator is None, denominator is None]):
-                target.status = Status.UNDERSTAFFED
-            else:
-                match nominator / denominator:
-                    case x if x < YELLOW:  # RED
-                        target.status = Status.UNDERSTAFFED
-                    case x if x < BLUE:  # YELLOW
-                        target.status = Status.HALF_STAFFED
-                    case x if x >= BLUE:  # BLUE
-                        target.status = Status.FULL_STAFFED
-                    case _:  # todo: revisit this
-                        target.status = Status.UNDERSTAFFED
-
-        def aggregated_status_decision(target: Union[PolledDay, FramadatePoll], list_: list):
-            if all(list_ele.status == Status.FULL_STAFFED for list_ele in list_):
-                target.status = Status.FULL_STAFFED
-            elif all(list_ele.status == Status.HALF_STAFFED for list_ele in list_):
-                target.status = Status.HALF_STAFFED
-            elif any(list_ele.status == Status.UNDERSTAFFED for list_ele in list_):
-                target.status = Status.UNDERSTAFFED
-            elif (
-                    any(list_ele.status == Status.HALF_STAFFED for list_ele in list_)
-                    and not
-                    any(list_ele.status == Status.UNDERSTAFFED for list_ele in list_)
-            ):
-                target.status = Status.HALF_STAFFED
-            else:  # todo: revisit this
-                target.status = Status.UNDERSTAFFED
+    def _update_incrementally(
+            self, participants: List[str], codes: np.ndarray
+    ) -> None:
+        """Update the existing time slots and days with the responses of changed,
+        added and removed participants only
+
+        Args:
+            participants: Participant names of the previously processed poll data
+            codes: Encoded response matrix of the previously processed poll data
+        """
+        added, removed = diff_response_rows(
+            participants, codes, self._participants, self._response_codes
+        )
+        if len(added) == 0 and len(removed) == 0:
+            return
+        get_metrics().increment("incremental_updates")
+        with get_metrics().timer("tally"):
+            positives, maybes, _, _ = tally_responses(self._response_codes[added])
+            removed_positives, removed_maybes, _, _ = tally_responses(codes[removed])
+            positives -= removed_positives
+            maybes -= removed_maybes
+            polled = len(self._participants)
+            for time_slot in self._time_slots:
+                time_slot.polled = polled
+            changed = np.flatnonzero((positives != 0) | (maybes != 0))
+            for ii in changed:
+                time_slot = self._time_slots[ii]
+                time_slot.positives += int(positives[ii])
+                time_slot.maybes += int(maybes[ii])
+                time_slot.total = time_slot.positives + time_slot.maybes * MAYBE_FACTOR
+        self._decide_status()
+
+    def _decide_status(self) -> None:
+        """Determine the status of the time slots, the days and the poll"""
+        decide_statuses([self])
 
-        # Determine status
-        print("case", self.poll_type)
-        print("total_workforce:", self.total_workforce)
-        print("minimum_staff:", self.minimum_staff)
-        print("person_hours:", self.person_hours)
-        print("person_hours_per_day:", self.person_hours_per_day)
+    def _slot_totals(self) -> np.ndarray:
+        if self._slot_table is not None:
+            return self._slot_table.total
+        return np.array(
+            [
+                np.nan if time_slot.total is None else time_slot.total
+                for time_slot in self._time_slots
+            ],
+            dtype=np.float64,
+        )
+
+    def _slot_status_codes(self) -> np.ndarray:
+        if self._slot_table is not None:
+            return self._slot_table.status
+        return np.array(
+            [
+                NO_STATUS if time_slot.status is None
+                else STATUSES.index(time_slot.status)
+                for time_slot in self._time_slots
+            ],
+            dtype=np.int8,
+        )
+
+    def _set_slot_status_codes(self, codes: np.ndarray) -> None:
+        if self._slot_table is not None:
+            self._slot_table.status[:] = codes
+            return
+        for time_slot, code in zip(self._time_slots, codes):
+            time_slot.status = None if code == NO_STATUS else STATUSES[code]
+
+    @timed("status")
+    def _decide_status_per_day(self) -> None:
+        """Reference implementation of _decide_status, deciding the status of one
+        time slot and day at a time"""
+        debug = logger.isEnabledFor(logging.DEBUG)
+        if debug:
+            logger.debug(
+                "Deciding status of %s (%s): total_workforce=%s, minimum_staff=%s, "
+                "person_hours=%s, person_hours_per_day=%s",
+                self.poll_uri, self.poll_type, self.total_workforce,
+                self.minimum_staff, self.person_hours, self.person_hours_per_day,
+            )
         match self.poll_type:
             case PollType.booth:
                 for day in self._days:
@@ -354,12 +1153,18 @@ class FramadatePoll(BaseModel):
                     for time_slot in day.time_slots:
                         # Estimate status per time slot
                         if self.minimum_staff is not None and self.total_workforce is not None:
-                            status_decision(time_slot, time_slot.total, self.minimum_staff)
-
-                        print("timeslot:", time_slot.start_time, "status:",
-                              time_slot.status)
+                            status_decision(
+                                time_slot, time_slot.total, self.minimum_staff,
+                                self.thresholds,
+                            )
+                        if debug:
+                            logger.debug(
+                                "time slot %s %s: %s",
+                                day.date, time_slot.start_time, time_slot.status,
+                            )
                     aggregated_status_decision(day, day.time_slots)
-                    print("day:", day.date, "status:", day.status)
+                    if debug:
+                        logger.debug("day %s: %s", day.date, day.status)
 
             case PollType.poster:
                 self.total_workforce = 0
@@ -369,42 +1174,177 @@ class FramadatePoll(BaseModel):
                         if time_slot.total is not None
                     )
                     if self.person_hours_per_day is not None:
-                        status_decision(day, daily_total, self.person_hours_per_day)
+                        status_decision(
+                            day, daily_total, self.person_hours_per_day, self.thresholds
+                        )
                     self.total_workforce += daily_total
                 # If there is no required workforce per day, estimate the status of the
                 #  whole poll, else decide based on the status of the days
-                if all(day.status is None for day in self._days):
+                if self.person_hours_per_day is None:
                     for day in self._days:
-                        status_decision(day, self.total_workforce, self.person_hours)
+                        status_decision(
+                            day, self.total_workforce, self.person_hours, self.thresholds
+                        )
                 else:
                     aggregated_status_decision(self, self._days)
 
-#
-# async def async_fetch_poll_data(session: aiohttp.ClientSession, poll: FramadatePoll) -> str:
-#     """Asynchronous function to download the csv file of a poll"""
-#     csv_url = f"https://{DOMAIN}/exportcsv.php?poll={poll.poll_uri}"
-#     async with session.get(csv_url) as response:
-#         return await response.text()
-#
-#
-# async def async_fetch_polls_data(polls: List[FramadatePoll]) -> List[str]:
-#     """Asynchronous function to download the csv files of the polls"""
-#     async with aiohttp.ClientSession() as session:
-#         tasks = [async_fetch_poll_data(session, poll) for poll in polls]
-#         return await asyncio.gather(*tasks)
+
+def _threshold_arrays(
+        polls: List[FramadatePoll], counts: List[int]
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Yellow and blue threshold of every time slot or day, given their count per
+    poll"""
+    thresholds = [poll.thresholds or StatusThresholds() for poll in polls]
+    return (
+        np.repeat([threshold.yellow for threshold in thresholds], counts),
+        np.repeat([threshold.blue for threshold in thresholds], counts),
+    )
+
+
+def _optional(value: Optional[float]) -> float:
+    return np.nan if value is None else value
+
+
+@timed("status")
+def decide_statuses(polls: Iterable[FramadatePoll]) -> None:
+    """Determine the status of the time slots, the days and the polls of many
+    processed polls at once
+
+    The staffing ratios of all booth polls are classified in one pass, as are the
+    ones of all poster polls. Every poll uses its own thresholds. The rules are the
+    ones of _decide_status_per_day:
+    - Booth: the time slots are classified by total / minimum_staff, if both the
+      minimum staff and the total workforce are set, and keep their status
+      otherwise. The days are aggregated from their time slots.
+    - Poster: the total workforce is the sum of all time slots. With person hours
+      per day, the days are classified by their total / person_hours_per_day and
+      the poll is aggregated from its days. Otherwise every day gets the status of
+      total_workforce / person_hours.
+    """
+    polls = list(polls)
+    # Lock the polls in a fixed order, so concurrent calls cannot deadlock
+    with contextlib.ExitStack() as stack:
+        for poll in sorted(polls, key=id):
+            stack.enter_context(poll.lock)
+        _decide_statuses([poll for poll in polls if poll._days is not None])
+
+
+def _decide_statuses(polls: List[FramadatePoll]) -> None:
+    booth = [poll for poll in polls if poll.poll_type == PollType.booth]
+    poster = [poll for poll in polls if poll.poll_type == PollType.poster]
+
+    if booth:
+        slot_counts = [len(poll._time_slots) for poll in booth]
+        day_counts = [len(poll._days) for poll in booth]
+        yellow, blue = _threshold_arrays(booth, slot_counts)
+        decided = np.repeat([
+            poll.minimum_staff is not None and poll.total_workforce is not None
+            for poll in booth
+        ], slot_counts)
+        slot_codes = np.where(
+            decided,
+            classify(
+                np.concatenate([poll._slot_totals() for poll in booth]),
+                np.repeat([_optional(poll.minimum_staff) for poll in booth], slot_counts),
+                yellow, blue,
+            ),
+            np.concatenate([poll._slot_status_codes() for poll in booth]),
+        )
+        day_offsets = np.cumsum([0] + day_counts)
+        day_codes = aggregate(
+            slot_codes,
+            np.concatenate([
+                poll._day_of_slot + offset for poll, offset in zip(booth, day_offsets)
+            ]),
+            day_offsets[-1],
+        )
+        slot_offsets = np.cumsum([0] + slot_counts)
+        for ii, poll in enumerate(booth):
+            poll._set_slot_status_codes(slot_codes[slot_offsets[ii]:slot_offsets[ii + 1]])
+            for day, code in zip(poll._days, day_codes[day_offsets[ii]:]):
+                day.status = STATUSES[code]
+
+    if poster:
+        day_counts = [len(poll._days) for poll in poster]
+        daily_totals = [
+            np.bincount(
+                poll._day_of_slot,
+                weights=np.nan_to_num(poll._slot_totals()),
+                minlength=len(poll._days),
+            )
+            for poll in poster
+        ]
+        for poll, daily_total in zip(poster, daily_totals):
+            poll.total_workforce = float(daily_total.sum())
+        per_day = [poll.person_hours_per_day is not None for poll in poster]
+        # Classify the days by their own total, or all of them by the poll's total
+        nominators = np.concatenate([
+            daily_total if by_day else np.full(len(daily_total), poll.total_workforce)
+            for poll, daily_total, by_day in zip(poster, daily_totals, per_day)
+        ])
+        denominators = np.repeat([
+            _optional(poll.person_hours_per_day if by_day else poll.person_hours)
+            for poll, by_day in zip(poster, per_day)
+        ], day_counts)
+        yellow, blue = _threshold_arrays(poster, day_counts)
+        day_codes = classify(nominators, denominators, yellow, blue)
+        poll_codes = aggregate(
+            day_codes, np.repeat(np.arange(len(poster)), day_counts), len(poster)
+        )
+        day_offsets = np.cumsum([0] + day_counts)
+        for ii, poll in enumerate(poster):
+            for day, code in zip(poll._days, day_codes[day_offsets[ii]:]):
+                day.status = STATUSES[code]
+            if per_day[ii]:
+                poll.status = STATUSES[poll_codes[ii]]
+
+    if logger.isEnabledFor(logging.DEBUG):
+        for poll in booth + poster:
+            logger.debug(
+                "Decided status of %s (%s): total_workforce=%s, minimum_staff=%s, "
+                "person_hours=%s, person_hours_per_day=%s",
+                poll.poll_uri, poll.poll_type, poll.total_workforce,
+                poll.minimum_staff, poll.person_hours, poll.person_hours_per_day,
+            )
+            for day in poll._days:
+                for time_slot in day.time_slots:
+                    logger.debug(
+                        "time slot %s %s: %s",
+                        day.date, time_slot.start_time, time_slot.status,
+                    )
+                logger.debug("day %s: %s", day.date, day.status)
+
+
+_fetcher: Optional[PollFetcher] = None
+
+
+def get_fetcher() -> PollFetcher:
+    """Return the process-wide fetcher, sharing one connection pool between all
+    polls"""
+    global _fetcher
+    if _fetcher is None:
+        _fetcher = PollFetcher(
+            base_url=f"https://{DOMAIN}", parser_factory=PollDataParser
+        )
+    return _fetcher
 
 
 def fetch_poll_data(poll: FramadatePoll) -> str:
     """Synchronous version"""
-    # return asyncio.run(async_fetch_poll_data(poll))
-    return requests.get(f"https://{DOMAIN}/exportcsv.php?poll={poll.poll_uri}").text
+    return get_fetcher().fetch([poll.poll_uri])[0]
 
-def fetch_polls_data(polls: List[FramadatePoll], use_async: bool = False) -> List[str]:
-    """Synchronous version"""
-    # if use_async:
-    #     return asyncio.run(async_fetch_polls_data(polls))
-    # Instead use requests to download the csv file
-    return [requests.get(f"https://{DOMAIN}/exportcsv.php?poll={poll.poll_uri}").text for poll in polls]
+
+def fetch_polls_data(polls: List[FramadatePoll], use_async: bool = True) -> List[str]:
+    """Synchronous version, downloading the polls concurrently unless use_async is
+    False"""
+    if use_async:
+        return get_fetcher().fetch([poll.poll_uri for poll in polls])
+    return [fetch_poll_data(poll) for poll in polls]
+
+
+async def async_fetch_polls_data(polls: List[FramadatePoll]) -> List[str]:
+    """Asynchronous function to download the csv files of the polls"""
+    return await get_fetcher().afetch([poll.poll_uri for poll in polls])
 
 
 if __name__ == "__main__":
@@ -413,7 +1353,3 @@ if __name__ == "__main__":
     # infostand.update()
     # plakatieren.update()
     poll_data = fetch_polls_data([infostand, plakatieren])
-    # thread = run_async(async_fetch_polls_data, aiohttp.ClientSession(), [infostand,
-    #                                                                      plakatieren])
-    # thread.join()
-    # data = thread.result
\ No newline at end of file
@@ -0,0 +1,187 @@
+import argparse
+import json
+import logging
+import os
+import tempfile
+import time
+from datetime import datetime
+from typing import List, Optional
+
+from core import POLLS_PATH, FramadatePoll
+from metrics import get_metrics
+from poll_set import PollSet
+from processing import DEFAULT_MODE, DEFAULT_WORKERS, MODES, PollProcessor
+from timeline import (
+    BOOTSTRAP_SUBSET_CSS, DEFAULT_DATA, ENTRY_FIELDS_FROM_DAY, INTRODUCTION,
+    LEGEND_HTML, PAGE_TITLE, TIMELINE_CSS, Entry, EntryStore, render_timeline,
+)
+
+DEFAULT_OUTPUT_DIR = "public"
+"""Directory the static bundle is written to"""
+HTML_FILE = "index.html"
+JSON_FILE = "timeline.json"
+METRICS_FILE = "metrics.prom"
+
+
+def render_page(entries: List[Entry], generated_at: datetime) -> str:
+    """Render the complete dashboard as a standalone HTML page"""
+    timeline = render_timeline(
+        {**DEFAULT_DATA, "loading": False},
+        ((entry.id, entry.html) for entry in entries),
+        revision=0,
+    )
+    return f"""<!DOCTYPE html>
+<html lang="de">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1">
+    <title>{PAGE_TITLE}</title>
+    <style>
+{BOOTSTRAP_SUBSET_CSS}
+{TIMELINE_CSS}
+    </style>
+</head>
+<body class="dashboard">
+<h1>{PAGE_TITLE}</h1>
+<p>{INTRODUCTION}</p>
+{LEGEND_HTML}
+{timeline}
+<p>Stand: {generated_at.strftime("%d.%m.%y %H:%M")}</p>
+</body>
+</html>
+"""
+
+
+def render_json(entries: List[Entry], generated_at: datetime) -> str:
+    """Render the entries of the timeline as JSON, including their HTML"""
+    return json.dumps({
+        "generated_at": generated_at.isoformat(timespec="seconds"),
+        "title": PAGE_TITLE,
+        "entries": [
+            {
+                "id": entry.id,
+                **entry.model_dump(
+                    mode="json", include=set(ENTRY_FIELDS_FROM_DAY), exclude_none=True
+                ),
+                "html": entry.html,
+            }
+            for entry in entries
+        ],
+    }, ensure_ascii=False, indent=1)
+
+
+def write_atomically(path: str, content: str) -> None:
+    """Write the file next to its destination and move it into place, so a file
+    server never delivers a partially written file"""
+    directory = os.path.dirname(path) or "."
+    with tempfile.NamedTemporaryFile(
+            "w", encoding="utf-8", dir=directory, suffix=".tmp", delete=False
+    ) as f:
+        f.write(content)
+        f.flush()
+        os.fsync(f.fileno())
+    os.chmod(f.name, 0o644)
+    os.replace(f.name, path)
+
+
+def export(
+        polls: List[FramadatePoll],
+        output_dir: str = DEFAULT_OUTPUT_DIR,
+        entry_store: Optional[EntryStore] = None,
+        processor: Optional[PollProcessor] = None,
+) -> List[Entry]:
+    """Fetch the polls and write the static bundle of the dashboard
+
+    Args:
+        polls: Polls to export, processed incrementally if they were exported before.
+            Polls of previous exports missing from them are removed. A poll that
+            fails to fetch or parse is skipped, keeping its entries of previous
+            exports.
+        output_dir: Directory of the bundle, created if missing
+        entry_store: Store keeping the entries between exports
+        processor: Processor fetching and parsing the polls, parsing inline if None
+    Returns:
+        The exported entries
+    """
+    entry_store = entry_store if entry_store is not None else EntryStore()
+    processor = processor if processor is not None else PollProcessor("inline")
+    today = datetime.now().date()
+    entry_store.retain_polls(poll.poll_uri for poll in polls)
+    results = processor.process(polls, return_exceptions=True)
+    for poll, result in zip(polls, results):
+        if isinstance(result, BaseException):
+            # The previous entries of the poll stay in the bundle
+            logging.warning("Skipping %s: %r", poll.poll_uri, result)
+            continue
+        entry_store.update_poll(result)
+    entries = entry_store.entries(today)
+    generated_at = datetime.now()
+    os.makedirs(output_dir, exist_ok=True)
+    # The JSON goes first, so the page never announces entries the JSON lacks
+    write_atomically(
+        os.path.join(output_dir, JSON_FILE), render_json(entries, generated_at)
+    )
+    write_atomically(
+        os.path.join(output_dir, HTML_FILE), render_page(entries, generated_at)
+    )
+    if get_metrics().enabled:
+        write_atomically(
+            os.path.join(output_dir, METRICS_FILE), get_metrics().to_prometheus()
+        )
+    return entries
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Render the dashboard to a static HTML/JSON bundle"
+    )
+    parser.add_argument("--polls", default=POLLS_PATH, help="yaml file of the polls")
+    parser.add_argument(
+        "--output", default=DEFAULT_OUTPUT_DIR, help="directory of the bundle"
+    )
+    parser.add_argument(
+        "--interval", type=float, default=0,
+        help="seconds between two exports, export once if 0",
+    )
+    parser.add_argument(
+        "--metrics", action="store_true",
+        help=f"collect stage timings and counters, written to {METRICS_FILE}",
+    )
+    parser.add_argument(
+        "--log-level", default="WARNING", help="e.g. INFO, or DEBUG for every status"
+    )
+    parser.add_argument(
+        "--mode", choices=MODES, default=DEFAULT_MODE,
+        help="where the csv exports are parsed",
+    )
+    parser.add_argument(
+        "--workers", type=int, default=DEFAULT_WORKERS, help="parser threads or processes"
+    )
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=args.log_level.upper())
+    get_metrics().enabled = args.metrics
+
+    poll_set = PollSet(args.polls)
+    poll_set.reload()
+    entry_store = EntryStore()
+    processor = PollProcessor(args.mode, args.workers)
+    try:
+        while True:
+            try:
+                # Pick up changes of the yaml file, keeping the unchanged polls
+                poll_set.reload()
+                entries = export(poll_set.polls, args.output, entry_store, processor)
+                logging.info("Exported %d entries to %s", len(entries), args.output)
+            except Exception as error:
+                if not args.interval:
+                    raise
+                # Keep serving the previous bundle and try again on schedule
+                logging.error("Export failed: %r", error)
+            if not args.interval:
+                break
+            time.sleep(args.interval)
+    finally:
+        processor.close()
+
+if __name__ == "__main__":
+    main()
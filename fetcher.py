@@ -0,0 +1,289 @@
+import asyncio
+import codecs
+import hashlib
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+import aiohttp
+from pydantic import BaseModel
+
+from metrics import get_metrics
+
+DEFAULT_CONCURRENCY = 8
+"""Maximum number of simultaneous requests against the poll backend"""
+DEFAULT_TIMEOUT = 10.0
+"""Timeout in seconds for a single request"""
+DEFAULT_RETRIES = 2
+"""Number of additional attempts after a failed request"""
+DEFAULT_BACKOFF = 0.5
+"""Base delay in seconds, doubled after every failed attempt"""
+CHUNK_SIZE = 64 * 1024
+"""Number of bytes read from the response body at once"""
+
+
+def content_digest(text: str) -> str:
+    """Hash of the poll data, used to detect unchanged csv exports. Equal to the
+    hash of the raw body the fetcher computes, as the exports are UTF-8 encoded."""
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class FetchResult(BaseModel):
+    poll_uri: str
+    text: str
+    """Body of the csv export"""
+    digest: str
+    """Content hash of the body"""
+    etag: Optional[str] = None
+    """ETag validator sent by the server"""
+    last_modified: Optional[str] = None
+    """Last-Modified validator sent by the server"""
+    not_modified: bool = False
+    """The server answered a conditional request with 304 Not Modified"""
+    changed: bool = True
+    """The body differs from the one of the previous fetch"""
+    parsed: Optional[Any] = None
+    """Result of the fetcher's parser, fed with the body while it was streamed"""
+
+
+class PollFetcher:
+    """Concurrent downloader for the csv exports of Framadate polls.
+
+    All requests share one connection-pooled session, which lives on a private event
+    loop in a daemon thread. This way the fetcher can be used from synchronous code as
+    well as from coroutines running on another loop (e.g. Panel callbacks).
+
+    Validators (ETag, Last-Modified) and the content hash of the last response are
+    remembered per poll, so follow-up requests are conditional and unchanged bodies
+    are flagged as such.
+
+    If a parser factory is given, every response body is fed into a new parser chunk
+    by chunk while it is downloaded. The parser has to provide feed(str) and close(),
+    the latter returning the parsed result.
+    """
+
+    def __init__(
+            self,
+            base_url: str,
+            concurrency: int = DEFAULT_CONCURRENCY,
+            timeout: float = DEFAULT_TIMEOUT,
+            retries: int = DEFAULT_RETRIES,
+            backoff: float = DEFAULT_BACKOFF,
+            parser_factory: Optional[Callable[[], Any]] = None,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.parser_factory = parser_factory
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._last: Dict[str, FetchResult] = {}
+        """Last result per poll_uri, only accessed on the fetcher's loop"""
+
+    def export_url(self, poll_uri: str) -> str:
+        return f"{self.base_url}/exportcsv.php?poll={poll_uri}"
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(
+                    target=self._loop.run_forever, name="poll-fetcher", daemon=True
+                )
+                self._thread.start()
+            return self._loop
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        # Only ever called on the fetcher's own loop, hence no locking required
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.concurrency),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self._session
+
+    @staticmethod
+    def _conditional_headers(previous: Optional[FetchResult]) -> Dict[str, str]:
+        headers = {}
+        if previous is not None:
+            if previous.etag:
+                headers["If-None-Match"] = previous.etag
+            if previous.last_modified:
+                headers["If-Modified-Since"] = previous.last_modified
+        return headers
+
+    async def _fetch_one(self, poll_uri: str, parse: bool = True) -> FetchResult:
+        metrics = get_metrics()
+        with metrics.timer("fetch"):
+            result = await self._fetch_with_retries(poll_uri, parse)
+        metrics.increment("fetches")
+        if result.not_modified:
+            metrics.increment("not_modified")
+        return result
+
+    async def _fetch_with_retries(self, poll_uri: str, parse: bool) -> FetchResult:
+        session = await self._get_session()
+        url = self.export_url(poll_uri)
+        for attempt in range(self.retries + 1):
+            previous = self._last.get(poll_uri)
+            try:
+                async with self._semaphore:
+                    async with session.get(
+                            url, headers=self._conditional_headers(previous)
+                    ) as response:
+                        if response.status == 304 and previous is not None:
+                            result = previous.model_copy(
+                                update={"not_modified": True, "changed": False}
+                            )
+                        else:
+                            response.raise_for_status()
+                            text, digest, parsed = await self._read_body(
+                                response, parse
+                            )
+                            result = FetchResult(
+                                poll_uri=poll_uri,
+                                text=text,
+                                digest=digest,
+                                etag=response.headers.get("ETag"),
+                                last_modified=response.headers.get("Last-Modified"),
+                                changed=previous is None or previous.digest != digest,
+                                parsed=parsed,
+                            )
+                        self._last[poll_uri] = result.model_copy(update={"parsed": None})
+                        return result
+            except (aiohttp.ClientError, asyncio.TimeoutError) as error:
+                # Client errors (except rate limiting) won't go away by retrying
+                if (
+                        isinstance(error, aiohttp.ClientResponseError)
+                        and error.status < 500 and error.status != 429
+                ):
+                    raise
+                if attempt == self.retries:
+                    raise
+                await asyncio.sleep(self.backoff * 2 ** attempt)
+
+    @staticmethod
+    def _feed(parser: Optional[Any], piece: str) -> Optional[Any]:
+        """Feed the parser, giving up on parsing if the body turns out to be invalid.
+        The consumer is left to parse the body itself and to report the error."""
+        if parser is not None:
+            try:
+                parser.feed(piece)
+            except ValueError:
+                return None
+        return parser
+
+    async def _read_body(
+            self, response: aiohttp.ClientResponse, parse: bool = True
+    ) -> Tuple[str, str, Optional[Any]]:
+        """Stream the body of the response, hashing the raw chunks and decoding and,
+        unless parse is False, parsing them one by one. The decoded text is returned
+        in full either way."""
+        decoder = codecs.getincrementaldecoder(response.charset or "utf-8")("replace")
+        hasher = hashlib.blake2b(digest_size=16)
+        parser = (
+            self.parser_factory()
+            if parse and self.parser_factory is not None else None
+        )
+        metrics = get_metrics()
+        parse_time = 0.0
+        pieces = []
+
+        def consume(piece: str):
+            nonlocal parser, parse_time
+            pieces.append(piece)
+            if metrics.enabled:
+                start = time.perf_counter()
+                parser = self._feed(parser, piece)
+                parse_time += time.perf_counter() - start
+            else:
+                parser = self._feed(parser, piece)
+
+        async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+            hasher.update(chunk)
+            consume(decoder.decode(chunk))
+        consume(decoder.decode(b"", final=True))
+        parsed = None
+        if parser is not None:
+            start = time.perf_counter()
+            try:
+                parsed = parser.close()
+            except ValueError:
+                parsed = None
+            metrics.record("parse", parse_time + time.perf_counter() - start)
+        return "".join(pieces), hasher.hexdigest(), parsed
+
+    async def _fetch_all(
+            self, poll_uris: List[str], parse: bool, return_exceptions: bool
+    ) -> List[Union[FetchResult, BaseException]]:
+        return await asyncio.gather(
+            *(self._fetch_one(uri, parse) for uri in poll_uris),
+            return_exceptions=return_exceptions,
+        )
+
+    def fetch_results_later(
+            self,
+            poll_uris: Iterable[str],
+            parse: bool = True,
+            return_exceptions: bool = False,
+    ) -> Future:
+        """Start downloading the csv exports of the given polls in the background.
+        The returned future resolves to the results in the order of the input.
+        Disable parse to leave parsing the bodies to the caller. With
+        return_exceptions, a failed download yields its exception in place of the
+        result instead of failing all of them."""
+        return asyncio.run_coroutine_threadsafe(
+            self._fetch_all(list(poll_uris), parse, return_exceptions),
+            self._ensure_loop(),
+        )
+
+    def fetch_results(
+            self,
+            poll_uris: Iterable[str],
+            parse: bool = True,
+            return_exceptions: bool = False,
+    ) -> List[Union[FetchResult, BaseException]]:
+        """Download the csv exports of the given polls concurrently, blocking until
+        all of them arrived. The results are in the order of the input."""
+        return self.fetch_results_later(poll_uris, parse, return_exceptions).result()
+
+    async def afetch_results(
+            self,
+            poll_uris: Iterable[str],
+            parse: bool = True,
+            return_exceptions: bool = False,
+    ) -> List[Union[FetchResult, BaseException]]:
+        """Awaitable version of fetch_results, usable from any event loop"""
+        return await asyncio.wrap_future(
+            self.fetch_results_later(poll_uris, parse, return_exceptions)
+        )
+
+    def fetch(self, poll_uris: Iterable[str]) -> List[str]:
+        """Like fetch_results, but returning the csv bodies only"""
+        return [result.text for result in self.fetch_results(poll_uris, parse=False)]
+
+    async def afetch(self, poll_uris: Iterable[str]) -> List[str]:
+        """Like afetch_results, but returning the csv bodies only"""
+        return [
+            result.text for result in await self.afetch_results(poll_uris, parse=False)
+        ]
+
+    def close(self) -> None:
+        """Close the session and stop the event loop of the fetcher"""
+        with self._lock:
+            loop, self._loop = self._loop, None
+        if loop is None:
+            return
+        if self._session is not None:
+            asyncio.run_coroutine_threadsafe(self._session.close(), loop).result()
+            self._session = None
+        loop.call_soon_threadsafe(loop.stop)
+        self._thread.join()
+        loop.close()
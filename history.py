@@ -0,0 +1,277 @@
+import os
+import shutil
+import threading
+import time
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from pydantic import BaseModel
+
+from core import MAYBE_FACTOR, NO_STATUS, STATUSES, FramadatePoll
+
+DEFAULT_HISTORY_PATH = "data/history"
+SLOTS_FILE = "slots.txt"
+COLUMNS = {
+    "recorded_at": np.uint32,
+    "slot": np.int32,
+    "positives": np.int16,
+    "maybes": np.int16,
+    "status": np.int8,
+}
+"""Column files of a poll and their dtype, 13 bytes per recorded tally"""
+
+
+class TallyHistory(BaseModel):
+    """Recorded tallies of the time slots of a poll, ordered by recording time
+
+    Every row is a change of the tally of one time slot, valid until the next row of
+    the same time slot.
+    """
+
+    slots: List[str]
+    """Column names of all time slots ever recorded for the poll, the index is the
+    slot id"""
+    recorded_at: np.ndarray
+    """Unix time of the fetch that recorded the tally"""
+    slot: np.ndarray
+    """Slot id"""
+    positives: np.ndarray
+    maybes: np.ndarray
+    status: np.ndarray
+    """Index into STATUSES, or NO_STATUS"""
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    def __len__(self) -> int:
+        return len(self.recorded_at)
+
+    @property
+    def total(self) -> np.ndarray:
+        """Estimated staff, computed like PolledTimeSlot.total"""
+        return self.positives + self.maybes * MAYBE_FACTOR
+
+
+class _PollHistory:
+    """Slot dictionary, row count and latest tally per slot of a poll, kept in
+    memory for delta encoding"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.slots: List[str] = []
+        self.slot_ids: Dict[str, int] = {}
+        self.rows = 0
+        self.positives = np.empty(0, dtype=np.int32)
+        self.maybes = np.empty(0, dtype=np.int32)
+        self.status = np.empty(0, dtype=np.int8)
+        self._load()
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _load(self) -> None:
+        if not os.path.isdir(self.directory):
+            return
+        if os.path.exists(self.path(SLOTS_FILE)):
+            with open(self.path(SLOTS_FILE), "r", encoding="utf-8") as f:
+                self.add_slots(f.read().splitlines(), write=False)
+        columns = {
+            name: np.fromfile(self.path(name), dtype=dtype)
+            if os.path.exists(self.path(name)) else np.empty(0, dtype=dtype)
+            for name, dtype in COLUMNS.items()
+        }
+        # An interrupted append leaves the columns with different lengths
+        self.rows = min(len(column) for column in columns.values())
+        # Drop the rows from the first one of a time slot missing from the slot
+        #  dictionary, e.g. if it was lost or truncated
+        unknown = np.flatnonzero(columns["slot"][:self.rows] >= len(self.slots))
+        if len(unknown):
+            self.rows = int(unknown[0])
+        for name, column in columns.items():
+            if len(column) > self.rows:
+                with open(self.path(name), "r+b") as f:
+                    f.truncate(self.rows * column.itemsize)
+        slot = columns["slot"][:self.rows]
+        # Index of the last row of every recorded slot
+        ids, reversed_index = np.unique(slot[::-1], return_index=True)
+        last = self.rows - 1 - reversed_index
+        self.positives[ids] = columns["positives"][last]
+        self.maybes[ids] = columns["maybes"][last]
+        self.status[ids] = columns["status"][last]
+
+    def add_slots(self, strings: List[str], write: bool = True) -> np.ndarray:
+        """Slot ids of the strings, adding the unknown ones"""
+        new = [string for string in dict.fromkeys(strings) if string not in self.slot_ids]
+        if new:
+            if write:
+                with open(self.path(SLOTS_FILE), "a", encoding="utf-8") as f:
+                    f.write("".join(string + "\n" for string in new))
+            for string in new:
+                self.slot_ids[string] = len(self.slots)
+                self.slots.append(string)
+            # Slots without a recorded tally never match a new one
+            self.positives = np.append(self.positives, np.full(len(new), -1, np.int32))
+            self.maybes = np.append(self.maybes, np.full(len(new), -1, np.int32))
+            self.status = np.append(self.status, np.full(len(new), NO_STATUS, np.int8))
+        return np.array([self.slot_ids[string] for string in strings], dtype=np.int32)
+
+    @property
+    def slot_dates(self) -> np.ndarray:
+        return np.array(
+            [string.split(" ")[0] for string in self.slots], dtype="datetime64[D]"
+        )
+
+
+class HistoryStore:
+    """Append-only history of the time slot tallies of every poll
+
+    Each fetch records only the time slots whose positives, maybes or status changed
+    since the last recorded tally, so unchanged polls and time slots cost nothing.
+    The tallies of a poll are stored column by column in binary files of its own
+    directory, next to a dictionary of the time slot columns. As the rows are
+    appended in chronological order, time ranges are located by binary search on the
+    recording times and only their rows are read. The total is not stored but
+    computed from positives and maybes.
+    """
+
+    def __init__(self, path: str = DEFAULT_HISTORY_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._polls: Dict[str, _PollHistory] = {}
+
+    def _history(self, poll_uri: str) -> _PollHistory:
+        history = self._polls.get(poll_uri)
+        if history is None:
+            history = self._polls[poll_uri] = _PollHistory(
+                os.path.join(self.path, poll_uri)
+            )
+        return history
+
+    def record(self, poll: FramadatePoll, recorded_at: Optional[float] = None) -> int:
+        """Append the changed tallies of a processed poll, returning their number"""
+        with poll.lock:
+            time_slots = [time_slot for day in poll.days for time_slot in day.time_slots]
+            strings = [time_slot.string for time_slot in time_slots]
+            positives = np.array(
+                [time_slot.positives for time_slot in time_slots], np.int32
+            )
+            maybes = np.array([time_slot.maybes for time_slot in time_slots], np.int32)
+            status = np.array([
+                NO_STATUS if time_slot.status is None
+                else STATUSES.index(time_slot.status)
+                for time_slot in time_slots
+            ], dtype=np.int8)
+        recorded_at = int(time.time() if recorded_at is None else recorded_at)
+        with self._lock:
+            history = self._history(poll.poll_uri)
+            os.makedirs(history.directory, exist_ok=True)
+            slot = history.add_slots(strings)
+            changed = (
+                (history.positives[slot] != positives)
+                | (history.maybes[slot] != maybes)
+                | (history.status[slot] != status)
+            )
+            if not changed.any():
+                return 0
+            columns = {
+                "recorded_at": np.full(changed.sum(), recorded_at),
+                "slot": slot[changed],
+                "positives": positives[changed],
+                "maybes": maybes[changed],
+                "status": status[changed],
+            }
+            for name, dtype in COLUMNS.items():
+                with open(history.path(name), "ab") as f:
+                    columns[name].astype(dtype).tofile(f)
+            history.positives[slot] = positives
+            history.maybes[slot] = maybes
+            history.status[slot] = status
+            history.rows += int(changed.sum())
+        return int(changed.sum())
+
+    def query(
+            self,
+            poll_uri: str,
+            start: Optional[date] = None,
+            end: Optional[date] = None,
+            slot: Optional[str] = None,
+            since: Optional[float] = None,
+            until: Optional[float] = None,
+    ) -> TallyHistory:
+        """Recorded tallies of a poll
+
+        Args:
+            poll_uri: Poll of the tallies
+            start: First date of the time slots, inclusive
+            end: Last date of the time slots, inclusive
+            slot: Column name of a single time slot
+            since: Earliest recording time, inclusive
+            until: Latest recording time, exclusive
+        """
+        with self._lock:
+            history = self._history(poll_uri)
+            slots, rows = list(history.slots), history.rows
+            slot_dates = history.slot_dates
+            recorded_at = (
+                np.memmap(history.path("recorded_at"), COLUMNS["recorded_at"], "r")[:rows]
+                if rows else np.empty(0, COLUMNS["recorded_at"])
+            )
+            lower = 0 if since is None else int(np.searchsorted(recorded_at, since))
+            upper = rows if until is None else int(np.searchsorted(recorded_at, until))
+            columns = {
+                name: np.fromfile(
+                    history.path(name), dtype=dtype, count=max(upper - lower, 0),
+                    offset=lower * np.dtype(dtype).itemsize,
+                ) if upper > lower else np.empty(0, dtype)
+                for name, dtype in COLUMNS.items()
+            }
+        mask = np.ones(len(columns["slot"]), dtype=bool)
+        if slot is not None:
+            mask &= columns["slot"] == (slots.index(slot) if slot in slots else -1)
+        if start is not None:
+            mask &= slot_dates[columns["slot"]] >= np.datetime64(start, "D")
+        if end is not None:
+            mask &= slot_dates[columns["slot"]] <= np.datetime64(end, "D")
+        return TallyHistory(
+            slots=slots, **{name: column[mask] for name, column in columns.items()}
+        )
+
+    def day_totals(
+            self,
+            poll_uri: str,
+            date_: date,
+            since: Optional[float] = None,
+            until: Optional[float] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Recording times and the summed total of all time slots of the day after
+        each of them, e.g. for a sparkline of how the day fills up. Time slots
+        recorded before since are included with their tally as of since."""
+        history = self.query(poll_uri, start=date_, end=date_, until=until)
+        if not len(history):
+            return history.recorded_at, history.total
+        # Change of the day's total by every row, relative to the previous row of
+        # the same slot
+        order = np.argsort(history.slot, kind="stable")
+        total = history.total[order]
+        first = np.r_[True, history.slot[order][1:] != history.slot[order][:-1]]
+        delta = np.empty_like(total)
+        delta[order] = np.where(first, total, total - np.r_[0.0, total[:-1]])
+        running = np.cumsum(delta)
+        # The total after the last row of every recording time
+        last = np.r_[history.recorded_at[1:] != history.recorded_at[:-1], True]
+        times, totals = history.recorded_at[last], running[last]
+        if since is not None:
+            before = times < since
+            if before.any() and not (times == since).any():
+                times = np.r_[since, times[~before]].astype(times.dtype)
+                totals = np.r_[totals[before][-1], totals[~before]]
+            else:
+                # Nothing recorded before, or a recording at since already
+                times, totals = times[~before], totals[~before]
+        return times, totals
+
+    def delete(self, poll_uri: str) -> None:
+        with self._lock:
+            self._polls.pop(poll_uri, None)
+            shutil.rmtree(os.path.join(self.path, poll_uri), ignore_errors=True)
@@ -0,0 +1,169 @@
+import functools
+import logging
+import threading
+import time
+from contextlib import nullcontext
+from typing import Callable, Dict, List, Optional
+
+from pydantic import BaseModel
+from tornado.web import RequestHandler
+
+logger = logging.getLogger(__name__)
+
+STAGES = ("fetch", "parse", "tally", "build", "status", "render")
+"""Stages of the pipeline from the csv export to the HTML of the timeline"""
+PROMETHEUS_PREFIX = "framadate_dashboard"
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+Hook = Callable[[str, str, float], None]
+"""Called with the kind ("timing" or "counter"), the name and the value of every
+recorded measurement"""
+
+
+class StageTiming(BaseModel):
+    count: int = 0
+    total: float = 0.0
+    """Sum of the durations in seconds"""
+    max: float = 0.0
+    """Longest duration in seconds"""
+
+
+class _Timer:
+    __slots__ = ("_metrics", "_stage", "_start")
+
+    def __init__(self, metrics: "Metrics", stage: str):
+        self._metrics = metrics
+        self._stage = stage
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._metrics.record(self._stage, time.perf_counter() - self._start)
+
+
+_DISABLED_TIMER = nullcontext()
+
+
+class Metrics:
+    """Timings per pipeline stage and counters, shared by all sessions of the process
+
+    Disabled metrics record nothing: timer returns a shared no-op context manager
+    and increment returns right away. Hooks receive every measurement as it is
+    recorded, e.g. to forward it to a monitoring system; the aggregated values are
+    available from snapshot and, in the Prometheus text format, from to_prometheus.
+    """
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._timings: Dict[str, StageTiming] = {}
+        self._counters: Dict[str, int] = {}
+        self._hooks: List[Hook] = []
+
+    def timer(self, stage: str):
+        """Context manager measuring the duration of a stage"""
+        if not self.enabled:
+            return _DISABLED_TIMER
+        return _Timer(self, stage)
+
+    def record(self, stage: str, seconds: float) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            timing = self._timings.setdefault(stage, StageTiming())
+            timing.count += 1
+            timing.total += seconds
+            timing.max = max(timing.max, seconds)
+        logger.debug("%s took %.3f ms", stage, seconds * 1000)
+        for hook in self._hooks:
+            hook("timing", stage, seconds)
+
+    def increment(self, name: str, value: int = 1) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+        for hook in self._hooks:
+            hook("counter", name, value)
+
+    def add_hook(self, hook: Hook) -> None:
+        self._hooks.append(hook)
+
+    def remove_hook(self, hook: Hook) -> None:
+        self._hooks.remove(hook)
+
+    def snapshot(self) -> dict:
+        """Copy of the aggregated timings and counters"""
+        with self._lock:
+            return {
+                "timings": {
+                    stage: timing.model_dump() for stage, timing in self._timings.items()
+                },
+                "counters": dict(self._counters),
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._timings.clear()
+            self._counters.clear()
+
+    def to_prometheus(self, prefix: str = PROMETHEUS_PREFIX) -> str:
+        """Aggregated values in the Prometheus text exposition format"""
+        snapshot = self.snapshot()
+        lines = [
+            f"# TYPE {prefix}_stage_seconds summary",
+            f"# TYPE {prefix}_stage_seconds_max gauge",
+        ]
+        for stage, timing in snapshot["timings"].items():
+            label = f'{{stage="{stage}"}}'
+            lines += [
+                f"{prefix}_stage_seconds_count{label} {timing['count']}",
+                f"{prefix}_stage_seconds_sum{label} {timing['total']}",
+                f"{prefix}_stage_seconds_max{label} {timing['max']}",
+            ]
+        for name, value in snapshot["counters"].items():
+            lines += [
+                f"# TYPE {prefix}_{name}_total counter",
+                f"{prefix}_{name}_total {value}",
+            ]
+        return "\n".join(lines) + "\n"
+
+
+_metrics: Optional[Metrics] = None
+
+
+def get_metrics() -> Metrics:
+    """Return the process-wide metrics, disabled unless enabled explicitly"""
+    global _metrics
+    if _metrics is None:
+        _metrics = Metrics()
+    return _metrics
+
+
+def timed(stage: str):
+    """Decorator measuring every call of the function as the given stage"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            metrics = get_metrics()
+            if not metrics.enabled:
+                return func(*args, **kwargs)
+            with _Timer(metrics, stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class MetricsHandler(RequestHandler):
+    """Serves the process-wide metrics in the Prometheus text format, e.g. for
+    `panel serve panels_app.py --plugins metrics`"""
+
+    def get(self):
+        self.set_header("Content-Type", PROMETHEUS_CONTENT_TYPE)
+        self.write(get_metrics().to_prometheus())
+
+
+ROUTES = [(r"/metrics", MetricsHandler)]
+"""Routes of the Panel plugin, see MetricsHandler"""
@@ -1,137 +1,45 @@
-import json
+import bisect
+import functools
+import os
 
-import yaml
 import param
 import panel
 from panel.custom import AnyWidgetComponent
-from pydantic import BaseModel, HttpUrl,PrivateAttr
-from typing import List, Optional
-from datetime import datetime
-from pydantic.types import date
-from core import (
-    FramadatePoll, LinkTarget, PolledDay, Status, Styling, Task,
-    fetch_polls_data, PollType, RED, YELLOW, BLUE
+from typing import Dict, Iterable, Tuple
+from broadcast import EntryItems, get_broadcaster
+from metrics import get_metrics
+from poll_set import get_poll_set
+from scheduler import get_scheduler
+from timeline import (
+    BOOTSTRAP_SUBSET_CSS, DEFAULT_DATA, INTRODUCTION, LEGEND_HTML, PAGE_TITLE,
+    TIMELINE_CSS, render_timeline,
 )
 
-DEFAULT_DATA = {
-    "entries": [],
-    "card_title": "Aktuelle Aktionen",
-    "legend_title": "Statuslegende",
-    "understaffed": int(YELLOW*100),
-    "half_staffed": int(BLUE*100),
-    "full_staffed": int(BLUE*100),
-}
+RENDER_ON_SERVER = True
+"""Render the timeline in Python instead of in the browser, with all CSS and JS
+served by the app itself"""
+METRICS_ENV = "DASHBOARD_METRICS"
+"""Environment variable enabling the stage timings and counters if set to 1. Serve
+the app with `--plugins metrics` to scrape them from /metrics."""
 
 
-class Entry(BaseModel):
-    """Class to represent a single day of an activity in the timeline"""
-
-    title: str
-    """Title of the activity entry"""
-    date: date
-    """Date of the activity entry"""
-    poll_url: Optional[HttpUrl] = None
-    """URL of the poll"""
-    poll_link_text: str = "Zur Umfrage"
-    """Display text of the poll link"""
-    description: Optional[str] = None
-    """Description of the activity"""
-    # todo: way / address description
-    status: Status
-    """Staffing and completion status indicator """
-    sub_tasks: Optional[List[Task]] = None
-    signal_group_link: Optional[HttpUrl] = None
-    """Link to the signal group of the activity"""
-    signal_group_link_text: str = "Zur Signal-Gruppe"
-    """Display text of the signal group link"""
-    google_maps_link: Optional[str] = None
-    """Coordinates of the location of the activity, to be used to create a google 
-    maps link."""  # todo: create google maps link (or map provider agnostic link)
-    google_maps_link_text: Optional[str] = "Zum Treffpunkt"
-    """Display text of the google maps link"""
-    header_tag: Optional[Styling] = Styling.h4
-    """Styling of the header, containing the title of the entry"""
-    body_tag: Optional[Styling] = Styling.p
-    """Styling of the body, containing the description of the entry, links and 
-    buttons"""
-    link_target: LinkTarget = LinkTarget.NEW
-    """Kind of action that should happen when clicking links in the entry"""
-    _links: Optional[str] = PrivateAttr(default="")
-    _html: Optional[str] = PrivateAttr(default="")
-    """HTML representation of the activity as a timeline entry"""
-
-    class Config:
-        arbitrary_types_allowed = True
-        extra = "allow"
-
-    def __init__(self, *args, **kwargs):
-        if len(args) == 1 and isinstance(args[0], FramadatePoll):
-            kwargs = args[0].dict()
-        data = kwargs
-        super().__init__(**data)
-        self._gen_html()
-
-    def _gen_html(self):  # todo: move to Poll
-        link_list = [
-            f'<a href="{self.poll_url}" target="{self.link_target.value}">'
-            f'{self.poll_link_text}</a>'
-        ]
-        if self.signal_group_link:
-            link_list.append(
-                f'<a href="{self.signal_group_link}" target="{self.link_target.value}">'
-                f'{self.signal_group_link_text}</a>'
-            )
-        if self.google_maps_link:
-            link_list.append(
-                f'<a href="{self.google_maps_link}" target="{self.link_target.value}">'
-                f'{self.signal_group_link_text}</a>'
-            )
-        # print("link_list:", link_list)
-        self._links = " | ".join(link_list)
-        # print("self._links:", self._links)
-        self._html = f"""<div class="vertical-timeline-item vertical-timeline-element">
-                    <div>
-                        <span class="vertical-timeline-element-icon bounce-in">
-                            <i class="{self.status.value}"> </i>
-                        </span>
-                        <div class="vertical-timeline-element-content bounce-in">
-                            {self.header_tag.value.opener} {self.title} {self.header_tag.value.closer}
-                            {self.body_tag.value.opener} {self.description} {self.body_tag.value.closer}
-                            {self.body_tag.value.opener} {self._links} {self.body_tag.value.closer}
-                            <span class="vertical-timeline-element-date">{self.date.strftime("%d.%m.%y")}</span>
-                        </div>
-                    </div>
-                </div>"""
-
-    @property
-    def html(self):
-        if not self._html:
-            self._gen_html()
-        return self._html
-
-
-class Entries(BaseModel):
-    items: list[Entry]
-    _html: Optional[str] = PrivateAttr("")
-
-    def _gen_html(self):
-        self._html = "\n".join([item.html for item in self.items])
-
-    def __init__(self, **data):
-        super().__init__(**data)
-        self._gen_html()
-
-    @property
-    def html(self):
-        self._gen_html()
-        return self._html
+class Timeline(AnyWidgetComponent):
+    """Timeline of entries, keyed by their id
 
+    The entries are not part of the synchronized data. Instead, update_entries sends
+    a patch with the removed, added and changed entries to the frontend, which
+    updates the DOM in place. Every patch increments the revision; a frontend that
+    missed a patch or rendered late requests the complete entries via resync.
+    """
 
-class Timeline(AnyWidgetComponent):
     index = param.Integer(default=0)
     data = param.Dict(
         default=DEFAULT_DATA
     )
+    revision = param.Integer(default=0)
+    """Number of entry patches sent to the frontend"""
+    resync = param.Integer(default=0)
+    """Incremented by the frontend to request all entries"""
 
     _importmap = {
         "imports": {
@@ -140,202 +48,12 @@ class Timeline(AnyWidgetComponent):
     }
     _stylesheets = [
         "https://cdn.jsdelivr.net/npm/bootstrap@4/dist/css/bootstrap.min.css",
-        """
-.badge-dot-xl {
-    width: 18px;
-    height: 18px;
-    position: relative;
-}
-
-.badge-dot-xl-inline {
-    display: inline-block;
-    vertical-align: middle;
-}
-
-.badge:empty {
-    display: none;
-}
-
-.badge-dot-xl::before {
-    content: '';
-    width: 10px;
-    height: 10px;
-    border-radius: .25rem;
-    position: absolute;
-    left: 50%;
-    top: 50%;
-    margin: -5px 0 0 -5px;
-    background: #fff;
-}
-
-body {
-    background-color: #fff; /* Set the background color to white */
-    margin: 0; /* Remove default margin */
-    padding: 0; /* Remove default padding */
-}
-
-.card {
-    box-shadow: none; /* Remove the shadow */
-    border: none; /* Remove the border */
-    transition: all .2s;
-    margin-left: 0; /* Ensure the card is aligned to the left */
-}
-
-.card {
-    position: relative;
-    display: flex;
-    flex-direction: column;
-    min-width: 0;
-    word-wrap: break-word;
-    background-color: #fff;
-    background-clip: border-box;
-    border-radius: .25rem;
-}
-
-.card-body {
-    padding-top: 10px; /* Reduce the top padding */
-    padding-bottom: 1.25rem;
-    padding-left: 1.25rem;
-    padding-right: 1.25rem;
-}
-
-.dot {
-    display: inline-block;
-    width: 12px;
-    height: 12px;
-    border-radius: 50%;
-    margin-right: 8px;
-}
-
-.dot-danger {
-    background-color: #d13c47;
-}
-
-.dot-warning {
-    background-color: #ffc107;
-}
-
-.dot-primary {
-    background-color: #367df8;
-}
-
-.dot-success {
-    background-color: #45a550;
-}
-
-.legend {
-    margin-top: 20px;
-    margin-bottom: 5px; /* Reduce the bottom margin */
-}
-
-.legend ul {
-    list-style: none;
-    padding: 0;
-}
-
-.legend li {
-    display: flex;
-    align-items: center;
-    margin-bottom: 5px;
-}
-
-.mt-20 {
-    margin-top: 20px;
-}
-
-.mb-10 {
-    margin-bottom: 10px;
-}
-
-.row {
-    margin-top: 20px;
-    margin-bottom: 10px;
-}
-
-.status-item {
-    display: flex;
-    align-items: center;
-    margin-bottom: 5px;
-}
-
-.status-item p {
-    margin: 0 0 0 5px;
-}
-
-.vertical-timeline {
-    width: 100%;
-    position: relative;
-    padding: 1.5rem 0 1rem;
-}
-
-.vertical-timeline::before {
-    content: '';
-    position: absolute;
-    top: 0;
-    left: 67px;
-    height: 100%;
-    width: 4px;
-    background: #e9ecef;
-    border-radius: .25rem;
-}
-
-.vertical-timeline-element {
-    position: relative;
-    margin: 0 0 1rem;
-}
-
-.vertical-timeline--animate .vertical-timeline-element-icon.bounce-in {
-    visibility: visible;
-    animation: cd-bounce-1 .8s;
-}
-
-.vertical-timeline-element-icon {
-    position: absolute;
-    top: 0;
-    left: 60px;
-}
-
-.vertical-timeline-element-icon .badge-dot-xl {
-    box-shadow: 0 0 0 5px #fff;
-}
-
-.vertical-timeline-element-content {
-    position: relative;
-    margin-left: 90px;
-    font-size: .8rem;
-}
-
-.vertical-timeline-element-content .timeline-title {
-    font-size: .8rem;
-    text-transform: uppercase;
-    margin: 0 0 .5rem;
-    padding: 2px 0 0;
-    font-weight: bold;
-}
-
-.vertical-timeline-element-content .vertical-timeline-element-date {
-    display: block;
-    position: absolute;
-    left: -90px;
-    top: 0;
-    padding-right: 10px;
-    text-align: right;
-    color: #adb5bd;
-    font-size: .7619rem;
-    white-space: nowrap;
-}
-
-.vertical-timeline-element-content:after {
-    content: "";
-    display: table;
-    clear: both;
-}
-"""
+        TIMELINE_CSS,
     ]
 
     _esm = """
     import Handlebars from "handlebars"
-    const timeline_area_template = `
+    const timeline_area_template = Handlebars.compile(`
 <head>
     <meta charset="UTF-8">
 </head>
@@ -346,70 +64,201 @@ body {
                 <h4 class="card-title">{{card_title}}</h4>
                 <div class="vertical-timeline vertical-timeline--animate 
                 vertical-timeline--one-column">               
-                    {{#each entries}}
-                        {{{html}}}
-                    {{/each}}
+                    {{#if loading}}
+                        <p>Aktionen werden geladen …</p>
+                    {{/if}}
                 </div>
             </div>
         </div>        
     </div> 
 </div>
-    `
+    `)
 
     function render({ model, el }) {
-      var template = Handlebars.compile(timeline_area_template);
-      model.on('change:data', () => {
-          el.innerHTML = template(model.get("data"));
-          console.log(model.get("data"))
-      })
-      el.innerHTML = template(model.get("data"));
+      const nodes = new Map()
+      let revision = 0
+      let container = null
+
+      function render_frame() {
+          el.innerHTML = timeline_area_template(model.get("data"))
+          container = el.querySelector(".vertical-timeline")
+          // Move the existing entries into the new frame instead of re-rendering them
+          for (const node of nodes.values()) {
+              container.appendChild(node)
+          }
+      }
+
+      function request_resync() {
+          model.set("resync", model.get("resync") + 1)
+          model.save_changes()
+      }
+
+      function apply_patch(msg) {
+          if (msg.type === "reset") {
+              for (const node of nodes.values()) {
+                  node.remove()
+              }
+              nodes.clear()
+          } else if (msg.base !== revision) {
+              request_resync()
+              return
+          }
+          for (const id of msg.remove) {
+              nodes.get(id)?.remove()
+              nodes.delete(id)
+          }
+          // Place the entries back to front, so the successor of each is in place
+          for (let i = msg.upsert.length - 1; i >= 0; i--) {
+              const {id, html, before} = msg.upsert[i]
+              let node = nodes.get(id)
+              if (node === undefined) {
+                  node = document.createElement("div")
+                  node.dataset.entryId = id
+                  nodes.set(id, node)
+              }
+              if (html !== undefined) {
+                  node.innerHTML = html
+              }
+              const successor = before === null ? null : nodes.get(before) ?? null
+              container.insertBefore(node, successor)
+          }
+          revision = msg.revision
+      }
+
+      model.on("change:data", render_frame)
+      model.on("msg:custom", apply_patch)
+      render_frame()
+      if (model.get("revision") > 0) {
+          request_resync()
+      }
     }
     export default { render };
     """
 
+    def __init__(self, **params):
+        super().__init__(**params)
+        self._entries: Dict[str, str] = {}
+        """HTML of the entries as shown in the frontend, by id and in order"""
+
+    @staticmethod
+    def _diff(old: Dict[str, str], new: Dict[str, str]) -> Tuple[list, list]:
+        """Removed ids and upserts turning the old entries into the new ones
+
+        Entries keeping their relative order (the longest increasing subsequence of
+        their old positions) stay in place. All other entries are upserted with the
+        id of the entry they have to be placed before, and with their html if they
+        are new or changed.
+        """
+        removed = [id_ for id_ in old if id_ not in new]
+        old_positions = {id_: ii for ii, id_ in enumerate(old)}
+        ids = list(new)
+        kept = [id_ for id_ in ids if id_ in old_positions]
+        # Longest increasing subsequence of the old positions, in O(n log n)
+        tails, tail_ids, previous = [], [], {}
+        for id_ in kept:
+            position = old_positions[id_]
+            jj = bisect.bisect_left(tails, position)
+            previous[id_] = tail_ids[jj - 1] if jj else None
+            if jj == len(tails):
+                tails.append(position)
+                tail_ids.append(id_)
+            else:
+                tails[jj] = position
+                tail_ids[jj] = id_
+        in_place = set()
+        id_ = tail_ids[-1] if tail_ids else None
+        while id_ is not None:
+            in_place.add(id_)
+            id_ = previous[id_]
+        upserts = []
+        for id_, next_id in zip(ids, ids[1:] + [None]):
+            changed = old.get(id_) != new[id_]
+            if changed or id_ not in in_place:
+                upsert = {"id": id_, "before": next_id}
+                if changed:
+                    upsert["html"] = new[id_]
+                upserts.append(upsert)
+        return removed, upserts
+
+    def update_entries(self, entries: Iterable[Tuple[str, str]]) -> None:
+        """Replace the entries of the timeline by the given (id, html) pairs, sending
+        only the difference to the frontend"""
+        new = dict(entries)
+        removed, upserts = self._diff(self._entries, new)
+        self._entries = new
+        if not removed and not upserts:
+            return
+        self.send({
+            "type": "patch",
+            "base": self.revision,
+            "revision": self.revision + 1,
+            "remove": removed,
+            "upsert": upserts,
+        })
+        self.revision += 1
+
+    @param.depends("resync", watch=True)
+    def _send_reset(self):
+        _, upserts = self._diff({}, self._entries)
+        self.send({
+            "type": "reset", "revision": self.revision, "remove": [], "upsert": upserts,
+        })
+
+
+class RenderedTimeline(Timeline):
+    """Timeline rendered by Python
+
+    The complete HTML, including the current entries, is part of the synchronized
+    data, and the frontend module has no imports. The first paint therefore needs
+    neither Handlebars nor Bootstrap from a CDN. Entries are patched in place just
+    like in Timeline; the HTML is only rendered again if the data changes.
+    """
+
+    html = param.String(default="")
+    """Rendered timeline, including the entries as of its revision"""
+
+    _importmap = {}
+    _stylesheets = [BOOTSTRAP_SUBSET_CSS, TIMELINE_CSS]
+    _esm = "static/timeline.js"
+
+    def __init__(self, **params):
+        super().__init__(**params)
+        self._render_html()
+
+    @param.depends("data", watch=True)
+    def _render_html(self):
+        self.html = render_timeline(self.data, self._entries.items(), self.revision)
+
 
 panel.extension()
 
-with open("data/polls.yaml", "r", encoding="utf-8") as f:
-    content = yaml.safe_load(f)
+if os.environ.get(METRICS_ENV) == "1":
+    get_metrics().enabled = True
 
-polls_from_yaml = [FramadatePoll(**poll) for poll in content]
 
 
-async def update(event, polls: List[FramadatePoll] = polls_from_yaml):
+async def update(event):
+    """Fetch the polls right away, within the fetch budget, and refresh the
+    timelines of all sessions, joining a refresh in progress"""
     timeline.index += 1
-    data = json.loads(json.dumps(timeline.data))
-    # await async_fetch_polls
-    poll_data = fetch_polls_data(polls)
-    # print("poll_data:", poll_data)
-    for poll, datum in zip(polls, poll_data):
-        poll.set_poll_data(datum)
-    days: List[PolledDay] = []
-    for poll in polls:
-        days.extend(poll.days)
-    today = datetime.now().date()
-    # past_days = [day for day in days if day.date < today]
-    future_days = [day for day in days if day.date >= today]
-    future_days_sorted = sorted(future_days, key=lambda x: x.date)
-    # entries_ = Entries(
-    #     items=[Entry(**day.model_dump()) for day in future_days_sorted]
-    # )
-    gen_entries = [Entry(**day.model_dump()) for day in future_days_sorted]
-    entries: list = data["entries"]
-    entries.extend([{"html": entry.html} for entry in gen_entries])
-
-    data["entries"] = entries
-    timeline.data = data
-
-
-title_and_description = panel.pane.HTML("""<!DOCTYPE html>
+    get_scheduler().mark_due(poll.poll_uri for poll in get_poll_set().polls)
+    await get_broadcaster().refresh()
+
+
+def show_entries(entries: EntryItems) -> None:
+    timeline.update_entries(entries)
+    if timeline.data["loading"]:
+        timeline.data = {**timeline.data, "loading": False}
+
+
+title_and_description = panel.pane.HTML(f"""<!DOCTYPE html>
 <html lang="de">
 <head>
     <meta charset="UTF-8">
-    <title>Grüne Würzburg-Stadt</title>
-    <h1>Grüne Würzburg-Stadt</h1>
+    <title>{PAGE_TITLE}</title>
+    <h1>{PAGE_TITLE}</h1>
 </head>
-<p>Willkommen auf der Übersichtsseite zu Gemeinschaftsaktionen der Grünen Würzburg-Stadt.</p>"""
+<p>{INTRODUCTION}</p>"""
 )
 refresh_button = panel.widgets.Button(name="Aktualisieren", width=100)
 refresh_button.on_click(update)
@@ -458,21 +307,40 @@ legend = panel.pane.HTML(
 <head>
     <meta charset="UTF-8">
 </head>
-<div class="legend">
-    <p>Statuslegende</p>
-    <ul>
-        <li><span class="dot dot-danger"></span>Unterbesetzt (&lt; 50 
-        %)</li>
-        <li><span class="dot dot-warning"></span>Halb besetzt (&lt; 80 
-        %)</li>
-        <li><span class="dot dot-primary"></span>Gut besetzt (&gt; 80 
-        %)</li>
-        <li><span class="dot dot-success"></span>Abgeschlossen</li>
-    </ul>
-</div>
-    """
+""" + LEGEND_HTML
 )
-timeline = Timeline(width=1000, data=DEFAULT_DATA)
+timeline = (RenderedTimeline if RENDER_ON_SERVER else Timeline)(
+    width=1000, data=DEFAULT_DATA
+)
+
+document = panel.state.curdoc
+
+
+def receive_entries(entries: EntryItems) -> None:
+    """Show the entries of a broadcast, which may run outside of this session"""
+    if document is None:
+        show_entries(entries)
+    else:
+        document.add_next_tick_callback(functools.partial(show_entries, entries))
+
+
+# Fetch the polls that are due, apply changes of the yaml file of the polls and
+#  push the timeline to all sessions, once per server process
+get_broadcaster().start()
+
+
+async def load_timeline():
+    get_broadcaster().subscribe(receive_entries)
+    panel.state.on_session_destroyed(
+        lambda session_context: get_broadcaster().unsubscribe(receive_entries)
+    )
+    if get_broadcaster().entries is None:
+        await get_broadcaster().refresh()
+
+
+# Serve the page with the loading timeline right away and fetch the polls once the
+#  page has been rendered
+panel.state.onload(load_timeline)
 
 app = panel.Column(
     title_and_description,
@@ -0,0 +1,140 @@
+import logging
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import yaml
+from pydantic import BaseModel
+
+from core import POLLS_PATH, FramadatePoll
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RELOAD_PERIOD = 5.0
+"""Seconds between two checks of the yaml file for changes"""
+
+
+class PollSetChange(BaseModel):
+    """Difference between two versions of the yaml file of the polls"""
+
+    added: List[FramadatePoll] = []
+    changed: List[FramadatePoll] = []
+    """New instances of the polls whose configuration changed"""
+    removed: List[str] = []
+    """poll_uri of the removed polls"""
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.changed or self.removed)
+
+    @property
+    def fetched(self) -> List[FramadatePoll]:
+        """Polls that have to be fetched and processed"""
+        return self.added + self.changed
+
+
+def config_poll_uri(config: dict) -> str:
+    """poll_uri of the configuration of a poll, as set by FramadatePoll.url_and_uri"""
+    if "poll_uri" in config:
+        return config["poll_uri"]
+    if "poll_url" in config:
+        return str(config["poll_url"]).split("/")[-1]
+    raise ValueError("Either poll_uri or poll_url must be set")
+
+
+class PollSet:
+    """Polls configured in the yaml file, reloaded when the file changes
+
+    The polls of a reload are matched to the running ones by poll_uri. Only polls
+    that were added or whose configuration changed are constructed again; the
+    instances of all other polls are kept, including their processed state. A file
+    that cannot be read or contains an invalid poll is logged and ignored, keeping
+    the running polls.
+    """
+
+    def __init__(self, path: str = POLLS_PATH):
+        self.path = path
+        self._polls: Dict[str, FramadatePoll] = {}
+        """Polls by poll_uri, in the order of the file"""
+        self._configs: Dict[str, dict] = {}
+        self._stat: Optional[Tuple[int, int]] = None
+        """Modification time and size of the file as of the last reload"""
+        self._lock = threading.Lock()
+
+    @property
+    def polls(self) -> List[FramadatePoll]:
+        """Current polls, in the order of the file"""
+        return list(self._polls.values())
+
+    def _file_stat(self) -> Tuple[int, int]:
+        stat = os.stat(self.path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def _read(self) -> Dict[str, dict]:
+        with open(self.path, "r", encoding="utf-8") as f:
+            content = yaml.safe_load(f) or []
+        configs = {}
+        for config in content:
+            poll_uri = config_poll_uri(config)
+            if poll_uri in configs:
+                logger.warning("Ignoring duplicate poll %s in %s", poll_uri, self.path)
+                continue
+            configs[poll_uri] = config
+        return configs
+
+    def diff(self, configs: Dict[str, dict]) -> PollSetChange:
+        """Construct the added and changed polls of the configurations, without
+        applying them"""
+        change = PollSetChange()
+        for poll_uri, config in configs.items():
+            if poll_uri not in self._configs:
+                change.added.append(FramadatePoll(**config))
+            elif config != self._configs[poll_uri]:
+                change.changed.append(FramadatePoll(**config))
+        change.removed = [
+            poll_uri for poll_uri in self._configs if poll_uri not in configs
+        ]
+        return change
+
+    def reload(self, force: bool = False) -> PollSetChange:
+        """Apply the yaml file if it changed since the last reload, returning the
+        difference to the previous polls"""
+        with self._lock:
+            try:
+                stat = self._file_stat()
+                if stat == self._stat and not force:
+                    return PollSetChange()
+                configs = self._read()
+                change = self.diff(configs)
+            except Exception as error:
+                if self._stat is None:
+                    raise
+                logger.error("Keeping the polls, reloading %s failed: %r", self.path, error)
+                return PollSetChange()
+            replaced = {poll.poll_uri: poll for poll in change.fetched}
+            self._polls = {
+                poll_uri: replaced.get(poll_uri) or self._polls[poll_uri]
+                for poll_uri in configs
+            }
+            self._configs = configs
+            self._stat = stat
+        if change:
+            logger.info(
+                "Reloaded %s: %d added, %d changed, %d removed polls", self.path,
+                len(change.added), len(change.changed), len(change.removed),
+            )
+        return change
+
+
+_poll_set: Optional[PollSet] = None
+
+
+def get_poll_set() -> PollSet:
+    """Return the process-wide set of polls, loaded on first access"""
+    global _poll_set
+    if _poll_set is None:
+        _poll_set = PollSet()
+        _poll_set.reload()
+    return _poll_set
@@ -0,0 +1,146 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Optional, Union
+
+from core import FramadatePoll, ParsedPollData, get_fetcher, parse_poll_data
+
+logger = logging.getLogger(__name__)
+
+MODES = ("inline", "thread", "process")
+"""Where the csv exports are parsed: in the calling thread, in a thread pool or in a
+process pool"""
+DEFAULT_WORKERS = min(4, os.cpu_count() or 1)
+"""Number of parser threads or processes"""
+DEFAULT_MODE = "process" if DEFAULT_WORKERS > 1 else "thread"
+"""Processes only pay off if they can run in parallel"""
+
+
+class PollProcessor:
+    """Fetches polls and parses their csv exports in a pool of workers
+
+    The polls are downloaded concurrently by the shared fetcher. Parsing the exports,
+    the CPU-bound part, is handed to the workers, which only receive the csv text and
+    return the picklable ParsedPollData: the participants, the time slot columns and
+    the encoded response matrix with its tallies. Building the time slots and days
+    from it stays in the calling thread, which keeps the processed state shared with
+    all sessions. Unchanged exports are not parsed at all.
+
+    Inline, the exports are parsed by the fetcher while they stream in instead,
+    overlapping parsing with the downloads. If the process pool cannot be started
+    or breaks, the processor falls back to parsing inline.
+    """
+
+    def __init__(self, mode: str = DEFAULT_MODE, workers: int = DEFAULT_WORKERS):
+        if mode not in MODES:
+            raise ValueError(f"Unknown mode {mode!r}, expected one of {MODES}")
+        self.mode = mode
+        self.workers = workers
+        self._executor: Optional[Executor] = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> Optional[Executor]:
+        with self._lock:
+            if self._executor is None and self.mode == "thread":
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix="poll-parser"
+                )
+            elif self._executor is None and self.mode == "process":
+                # Spawn instead of fork, as the server process runs several threads
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._executor
+
+    def _fall_back(self, error: BaseException) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+            mode, self.mode = self.mode, "inline"
+        if mode != "inline":
+            # Only once, futures of the broken pool may fail afterwards as well
+            logger.warning("Parsing inline, the %s pool failed: %r", mode, error)
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _parse_later(self, text: str) -> Future:
+        executor = self._get_executor()
+        if executor is not None:
+            try:
+                return executor.submit(parse_poll_data, text)
+            except (BrokenProcessPool, OSError, RuntimeError) as error:
+                self._fall_back(error)
+        future = Future()
+        try:
+            future.set_result(parse_poll_data(text))
+        except Exception as error:
+            future.set_exception(error)
+        return future
+
+    def _parsed(self, future: Future, text: str) -> ParsedPollData:
+        try:
+            return future.result()
+        except BrokenProcessPool as error:
+            self._fall_back(error)
+            return parse_poll_data(text)
+
+    def process(
+            self, polls: List[FramadatePoll], return_exceptions: bool = False
+    ) -> List[Union[FramadatePoll, BaseException]]:
+        """Fetch and process the polls, returning them in the order of the input
+
+        A poll that fails to download or parse keeps its state and does not affect
+        the other polls. With return_exceptions, its exception is returned in its
+        place; otherwise the first exception is raised once all other polls were
+        processed.
+        """
+        results = get_fetcher().fetch_results(
+            [poll.poll_uri for poll in polls],
+            parse=self.mode == "inline",
+            return_exceptions=True,
+        )
+        # Submit all exports first, so they are parsed in parallel. Exports parsed
+        # while streaming are only parsed again if the parser gave up on them.
+        futures = [
+            self._parse_later(result.text)
+            if not isinstance(result, BaseException) and result.parsed is None
+            and (result.digest != poll.poll_data_digest or not poll.is_loaded)
+            else None
+            for poll, result in zip(polls, results)
+        ]
+        processed = []
+        for poll, result, future in zip(polls, results, futures):
+            if isinstance(result, BaseException):
+                processed.append(result)
+                continue
+            try:
+                parsed = (
+                    self._parsed(future, result.text) if future is not None
+                    else result.parsed
+                )
+                poll.set_poll_data(result.text, digest=result.digest, parsed=parsed)
+            except Exception as error:
+                processed.append(error)
+            else:
+                processed.append(poll)
+        if not return_exceptions:
+            for result in processed:
+                if isinstance(result, BaseException):
+                    raise result
+        return processed
+
+    async def aprocess(
+            self, polls: List[FramadatePoll], return_exceptions: bool = False
+    ) -> List[Union[FramadatePoll, BaseException]]:
+        """Awaitable version of process, keeping the event loop free"""
+        return await asyncio.to_thread(self.process, polls, return_exceptions)
+
+    def close(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown()
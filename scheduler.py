@@ -0,0 +1,211 @@
+import collections
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Deque, Dict, Iterable, List, Optional
+
+from pydantic import BaseModel
+
+from cache import DEFAULT_TTL, PollCache
+from core import DEFAULT_DURATION, FramadatePoll
+from metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MIN_INTERVAL = 30.0
+"""Seconds between two fetches of a poll with a day starting now"""
+DEFAULT_MAX_INTERVAL = DEFAULT_TTL
+"""Seconds between two fetches of a poll without upcoming days"""
+DEFAULT_URGENCY_HORIZON = timedelta(days=14)
+"""Days starting later than this are refreshed at the maximum interval"""
+DEFAULT_CHANGE_BOOST = 3.0
+"""A poll that changed on every recent fetch is refreshed 1 + boost times as often"""
+DEFAULT_CHANGE_WINDOW = 10
+"""Number of recent fetches the change rate is computed from"""
+DEFAULT_BUDGET = 30
+"""Maximum number of fetches per budget period, over all polls"""
+DEFAULT_BUDGET_PERIOD = 60.0
+DEFAULT_TICK = 10.0
+"""Seconds between two checks for due polls"""
+
+
+class PollSchedule(BaseModel):
+    """Refresh state of a poll"""
+
+    interval: float = 0.0
+    """Seconds between the last and the next fetch"""
+    last_fetched: Optional[float] = None
+    """Monotonic time of the last fetch"""
+    next_due: float = 0.0
+    """Monotonic time the poll has to be fetched again"""
+    changes: List[bool] = []
+    """Whether the poll data changed, for the recent fetches"""
+
+    @property
+    def change_rate(self) -> float:
+        return sum(self.changes) / len(self.changes) if self.changes else 0.0
+
+
+class RefreshScheduler:
+    """Decides which polls to fetch, giving each poll its own refresh interval
+
+    The interval shrinks from max_interval to min_interval as the earliest upcoming
+    day of the poll approaches, and is divided by 1 + change_boost * the share of
+    recent fetches that changed the poll data. Polls that were never fetched are due
+    right away. At most budget fetches are started per budget period; if more polls
+    are due, the ones most overdue relative to their interval go first and the rest
+    wait for the next tick.
+    """
+
+    def __init__(
+            self,
+            min_interval: float = DEFAULT_MIN_INTERVAL,
+            max_interval: float = DEFAULT_MAX_INTERVAL,
+            urgency_horizon: timedelta = DEFAULT_URGENCY_HORIZON,
+            change_boost: float = DEFAULT_CHANGE_BOOST,
+            change_window: int = DEFAULT_CHANGE_WINDOW,
+            budget: int = DEFAULT_BUDGET,
+            budget_period: float = DEFAULT_BUDGET_PERIOD,
+    ):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.urgency_horizon = urgency_horizon
+        self.change_boost = change_boost
+        self.change_window = change_window
+        self.budget = budget
+        self.budget_period = budget_period
+        self._schedules: Dict[str, PollSchedule] = {}
+        self._fetch_times: Deque[float] = collections.deque()
+        """Monotonic times of the fetches within the budget period"""
+        self._lock = threading.Lock()
+
+    def schedule(self, poll_uri: str) -> PollSchedule:
+        with self._lock:
+            return self._schedules.setdefault(poll_uri, PollSchedule())
+
+    @staticmethod
+    def next_start(poll: FramadatePoll, now: datetime) -> Optional[datetime]:
+        """Start of the earliest time slot of the poll that has not ended yet, which
+        lies in the past while it is running"""
+        if not poll.is_loaded:
+            return None
+        starts = []
+        for day in poll.days:
+            # Time slots of the previous day may last past midnight
+            if day.date < now.date() - timedelta(days=1):
+                continue
+            midnight = datetime.combine(day.date, datetime.min.time())
+            for time_slot in day.time_slots:
+                start = midnight
+                if time_slot.start_time:
+                    start += timedelta(
+                        hours=int(time_slot.start_time[:2]),
+                        minutes=int(time_slot.start_time[3:5]),
+                    )
+                duration = (
+                    time_slot.duration if time_slot.duration is not None
+                    else DEFAULT_DURATION
+                )
+                if start + timedelta(hours=duration) >= now:
+                    starts.append(start)
+        return min(starts, default=None)
+
+    def interval(self, poll: FramadatePoll, now: Optional[datetime] = None) -> float:
+        """Seconds until the poll should be fetched again"""
+        now = now or datetime.now()
+        start = self.next_start(poll, now)
+        if start is None:
+            interval = self.max_interval
+        else:
+            urgency = min(max((start - now) / self.urgency_horizon, 0.0), 1.0)
+            interval = self.min_interval + urgency * (self.max_interval - self.min_interval)
+        interval /= 1 + self.change_boost * self.schedule(poll.poll_uri).change_rate
+        return max(interval, self.min_interval)
+
+    def due(
+            self, polls: Iterable[FramadatePoll], now: Optional[float] = None
+    ) -> List[FramadatePoll]:
+        """The polls to fetch now, most overdue first and within the budget"""
+        now = time.monotonic() if now is None else now
+        candidates = []
+        for poll in polls:
+            schedule = self.schedule(poll.poll_uri)
+            if schedule.last_fetched is None:
+                candidates.append((float("inf"), poll))
+            elif schedule.next_due <= now:
+                overdue = (now - schedule.last_fetched) / max(schedule.interval, 1e-9)
+                candidates.append((overdue, poll))
+        candidates.sort(key=lambda candidate: candidate[0], reverse=True)
+        with self._lock:
+            while self._fetch_times and self._fetch_times[0] <= now - self.budget_period:
+                self._fetch_times.popleft()
+            available = max(self.budget - len(self._fetch_times), 0)
+            self._fetch_times.extend([now] * min(available, len(candidates)))
+        if len(candidates) > available:
+            logger.info(
+                "Fetch budget exhausted, deferring %d polls", len(candidates) - available
+            )
+        return [poll for _, poll in candidates[:available]]
+
+    def record(
+            self, poll: FramadatePoll, changed: bool, now: Optional[float] = None
+    ) -> None:
+        """Schedule the next fetch of the poll after it was fetched"""
+        now = time.monotonic() if now is None else now
+        schedule = self.schedule(poll.poll_uri)
+        schedule.changes = (schedule.changes + [changed])[-self.change_window:]
+        schedule.interval = self.interval(poll)
+        schedule.last_fetched = now
+        schedule.next_due = now + schedule.interval
+
+    def mark_due(self, poll_uris: Iterable[str], now: Optional[float] = None) -> None:
+        """Let the polls be fetched on the next refresh regardless of their interval,
+        e.g. on request of a user. The fetches still count against the budget."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            for poll_uri in poll_uris:
+                schedule = self._schedules.get(poll_uri)
+                if schedule is not None:
+                    schedule.next_due = min(schedule.next_due, now)
+
+    def forget(self, poll_uri: str) -> None:
+        with self._lock:
+            self._schedules.pop(poll_uri, None)
+
+    async def refresh_due(
+            self, polls: Iterable[FramadatePoll], poll_cache: PollCache
+    ) -> List[FramadatePoll]:
+        """Fetch the due polls through the cache, returning the ones whose poll data
+        changed"""
+        due = self.due(polls)
+        if not due:
+            return []
+        digests = [poll.poll_data_digest for poll in due]
+        results = await poll_cache.refresh(due)
+        get_metrics().increment("scheduled_fetches", len(due))
+        changed = []
+        for poll, digest, result in zip(due, digests, results):
+            if isinstance(result, BaseException):
+                logger.warning("Scheduled fetch of %s failed: %r", poll.poll_uri, result)
+                # Try again after the regular interval instead of on every tick
+                self.record(poll, changed=False)
+                continue
+            if result.poll_data_digest != digest:
+                changed.append(result)
+            # Loading a poll for the first time does not count as change
+            self.record(
+                result, changed=digest is not None and result.poll_data_digest != digest
+            )
+        return changed
+
+
+_scheduler: Optional[RefreshScheduler] = None
+
+
+def get_scheduler() -> RefreshScheduler:
+    """Return the process-wide refresh scheduler"""
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = RefreshScheduler()
+    return _scheduler
@@ -0,0 +1,63 @@
+// Frontend of RenderedTimeline: the HTML is rendered by Python, so this module
+// has no imports and only patches the entries in place.
+
+function render({ model, el }) {
+  const nodes = new Map()
+  let revision = 0
+  let container = null
+
+  function render_html() {
+      el.innerHTML = model.get("html")
+      container = el.querySelector(".vertical-timeline")
+      revision = Number(container.dataset.revision)
+      nodes.clear()
+      for (const node of container.querySelectorAll(":scope > [data-entry-id]")) {
+          nodes.set(node.dataset.entryId, node)
+      }
+  }
+
+  function request_resync() {
+      model.set("resync", model.get("resync") + 1)
+      model.save_changes()
+  }
+
+  function apply_patch(msg) {
+      if (msg.type === "reset") {
+          for (const node of nodes.values()) {
+              node.remove()
+          }
+          nodes.clear()
+      } else if (msg.base !== revision) {
+          request_resync()
+          return
+      }
+      for (const id of msg.remove) {
+          nodes.get(id)?.remove()
+          nodes.delete(id)
+      }
+      // Place the entries back to front, so the successor of each is in place
+      for (let i = msg.upsert.length - 1; i >= 0; i--) {
+          const {id, html, before} = msg.upsert[i]
+          let node = nodes.get(id)
+          if (node === undefined) {
+              node = document.createElement("div")
+              node.dataset.entryId = id
+              nodes.set(id, node)
+          }
+          if (html !== undefined) {
+              node.innerHTML = html
+          }
+          const successor = before === null ? null : nodes.get(before) ?? null
+          container.insertBefore(node, successor)
+      }
+      revision = msg.revision
+  }
+
+  model.on("change:html", render_html)
+  model.on("msg:custom", apply_patch)
+  render_html()
+  if (model.get("revision") !== revision) {
+      request_resync()
+  }
+}
+export default { render };
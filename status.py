@@ -0,0 +1,67 @@
+import numpy as np
+from pydantic import BaseModel
+
+# Threshold for the status of the booth poll
+RED = 0.2
+YELLOW = 0.5
+BLUE = 0.8
+
+# Status codes, the indices of the members of core.Status
+UNDERSTAFFED = 0
+HALF_STAFFED = 1
+FULL_STAFFED = 2
+DONE = 3
+NO_STATUS = -1
+
+
+class StatusThresholds(BaseModel):
+    """Staffing ratios separating the statuses of a poll"""
+
+    red: float = RED
+    """Not used for a status of its own yet, ratios below yellow are understaffed"""
+    yellow: float = YELLOW
+    """Ratios from yellow on are half staffed"""
+    blue: float = BLUE
+    """Ratios from blue on are fully staffed"""
+
+
+def classify(
+        nominators: np.ndarray, denominators: np.ndarray, yellow: np.ndarray,
+        blue: np.ndarray,
+) -> np.ndarray:
+    """Status codes of the staffing ratios nominator / denominator, the vectorized
+    version of core.status_decision
+
+    All arguments are broadcast against each other, so the thresholds may be given
+    per ratio or once for all. A missing (NaN) nominator or denominator is
+    understaffed.
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratios = np.asarray(nominators, dtype=np.float64) / denominators
+    # Comparisons with NaN are False, leaving missing ratios understaffed
+    return np.where(
+        ratios >= blue, FULL_STAFFED, np.where(ratios >= yellow, HALF_STAFFED, UNDERSTAFFED)
+    ).astype(np.int8)
+
+
+def aggregate(codes: np.ndarray, groups: np.ndarray, n_groups: int) -> np.ndarray:
+    """Status code per group from the status codes of its members, the vectorized
+    version of core.aggregated_status_decision
+
+    Args:
+        codes: Status code of every member
+        groups: Group index of every member
+        n_groups: Number of groups, groups without members are fully staffed
+    """
+    def count(mask: np.ndarray) -> np.ndarray:
+        return np.bincount(groups[mask], minlength=n_groups)
+
+    members = np.bincount(groups, minlength=n_groups)
+    full = count(codes == FULL_STAFFED)
+    half = count(codes == HALF_STAFFED)
+    under = count(codes == UNDERSTAFFED)
+    return np.select(
+        [full == members, half == members, under > 0, half > 0],
+        [FULL_STAFFED, HALF_STAFFED, UNDERSTAFFED, HALF_STAFFED],
+        default=UNDERSTAFFED,
+    ).astype(np.int8)
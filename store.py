@@ -0,0 +1,87 @@
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from pydantic import BaseModel
+
+from core import FramadatePoll
+
+DEFAULT_SNAPSHOT_PATH = "data/snapshots.sqlite3"
+
+
+class Snapshot(BaseModel):
+    poll_uri: str
+    poll_data: str
+    """Raw csv export of the poll"""
+    digest: str
+    """Content hash of the raw csv export"""
+    fetched_at: float
+    """Unix time of the fetch"""
+
+
+class SnapshotStore:
+    """Persistent store of the last fetched csv export per poll, used to warm-start
+    the app and to serve stale data while the poll backend is unavailable. The
+    tallies are restored by processing the export, which also restores the response
+    matrix the incremental updates of the next fetch start from."""
+
+    def __init__(self, path: str = DEFAULT_SNAPSHOT_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._connection:
+            self._connection.execute(
+                """CREATE TABLE IF NOT EXISTS snapshots (
+                    poll_uri TEXT PRIMARY KEY,
+                    poll_data TEXT NOT NULL,
+                    digest TEXT NOT NULL,
+                    fetched_at REAL NOT NULL
+                )"""
+            )
+
+    def save(self, poll: FramadatePoll, fetched_at: Optional[float] = None) -> None:
+        """Store the current poll data of a processed poll"""
+        with poll.lock:
+            poll_data, digest = poll.poll_data, poll.poll_data_digest
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO snapshots VALUES (?, ?, ?, ?)",
+                (
+                    poll.poll_uri,
+                    poll_data,
+                    digest,
+                    time.time() if fetched_at is None else fetched_at,
+                ),
+            )
+
+    def load(self, poll_uri: str) -> Optional[Snapshot]:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT * FROM snapshots WHERE poll_uri = ?", (poll_uri,)
+            ).fetchone()
+        if row is None:
+            return None
+        return Snapshot(
+            poll_uri=row[0],
+            poll_data=row[1],
+            digest=row[2],
+            fetched_at=row[3],
+        )
+
+    def restore(self, poll: FramadatePoll) -> Optional[Snapshot]:
+        """Set the stored poll data of the poll, if there is a snapshot of it"""
+        snapshot = self.load(poll.poll_uri)
+        if snapshot is not None:
+            poll.set_poll_data(snapshot.poll_data, digest=snapshot.digest)
+        return snapshot
+
+    def delete(self, poll_uri: str) -> None:
+        with self._lock, self._connection:
+            self._connection.execute(
+                "DELETE FROM snapshots WHERE poll_uri = ?", (poll_uri,)
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
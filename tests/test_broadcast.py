@@ -0,0 +1,75 @@
+import asyncio
+from datetime import date, timedelta
+
+import panel
+import pytest
+import yaml
+
+import core
+from benchmarks.generator import make_poll_csv
+from benchmarks.stub_server import StubServer
+from broadcast import TimelineBroadcaster
+from cache import PollCache
+from core import PollDataParser
+from fetcher import PollFetcher
+from poll_set import PollSet
+
+POLL_URIS = ["poll0", "poll1"]
+
+
+@pytest.fixture
+def server(monkeypatch):
+    bodies = {
+        poll_uri: make_poll_csv(participants=5, days=2, start=date.today(), seed=ii)
+        for ii, poll_uri in enumerate(POLL_URIS)
+    }
+    with StubServer(bodies) as server:
+        fetcher = PollFetcher(server.base_url, parser_factory=PollDataParser)
+        monkeypatch.setattr(core, "_fetcher", fetcher)
+        yield server
+        fetcher.close()
+
+
+def write_polls(path, poll_uris) -> None:
+    path.write_text(yaml.safe_dump([
+        {"poll_uri": poll_uri, "title": poll_uri, "poll_type": "Infostand"}
+        for poll_uri in poll_uris
+    ]), encoding="utf-8")
+
+
+def test_reload_polls_pushes_changes(tmp_path, server):
+    path = tmp_path / "polls.yaml"
+    write_polls(path, POLL_URIS[:1])
+    poll_set = PollSet(str(path))
+    poll_set.reload()
+    broadcaster = TimelineBroadcaster(poll_set=poll_set, poll_cache=PollCache())
+    published = []
+    broadcaster.subscribe(published.append)
+    asyncio.run(broadcaster.refresh())
+    assert len(published[-1]) == 2
+    write_polls(path, POLL_URIS)
+    asyncio.run(broadcaster.reload_polls())
+    assert len(published) == 2 and len(published[-1]) == 4
+    # Nothing is pushed while the file is unchanged
+    asyncio.run(broadcaster.reload_polls())
+    assert len(published) == 2
+    write_polls(path, POLL_URIS[1:])
+    asyncio.run(broadcaster.reload_polls())
+    assert len(published) == 3 and len(published[-1]) == 2
+
+
+def test_tasks_are_scheduled_once(monkeypatch):
+    scheduled = []
+    monkeypatch.setattr(
+        panel.state, "schedule_task",
+        lambda name, callback, period: scheduled.append((name, callback, period)),
+    )
+    broadcaster = TimelineBroadcaster()
+    broadcaster.start(tick=2, reload_period=1)
+    broadcaster.start(tick=2, reload_period=1)
+    assert scheduled == [
+        ("refresh-timelines", broadcaster.refresh, timedelta(seconds=2)),
+        ("reload-polls", broadcaster.reload_polls, timedelta(seconds=1)),
+    ]
+    # Panel refuses callbacks defined in the served script
+    assert {callback.__module__ for _, callback, _ in scheduled} == {"broadcast"}
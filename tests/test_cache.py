@@ -0,0 +1,158 @@
+import asyncio
+import time
+
+import aiohttp
+import pytest
+
+import core
+from benchmarks.generator import make_poll_csv
+from benchmarks.stub_server import StubServer
+from cache import PollCache
+from core import FramadatePoll, PollDataParser, PollType
+from fetcher import PollFetcher
+from history import HistoryStore
+from store import SnapshotStore
+
+POLL_URIS = [f"poll{ii}" for ii in range(4)]
+
+
+@pytest.fixture
+def server(monkeypatch):
+    bodies = {
+        poll_uri: make_poll_csv(participants=5, days=2, seed=ii)
+        for ii, poll_uri in enumerate(POLL_URIS)
+    }
+    with StubServer(bodies) as server:
+        fetcher = PollFetcher(server.base_url, parser_factory=PollDataParser)
+        monkeypatch.setattr(core, "_fetcher", fetcher)
+        yield server
+        fetcher.close()
+
+
+def make_poll(poll_uri: str = "poll0", title: str = "Aktion") -> FramadatePoll:
+    return FramadatePoll(
+        poll_uri=poll_uri, title=title, poll_type=PollType.booth, minimum_staff=2,
+        total_workforce=3,
+    )
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SnapshotStore(str(tmp_path / "snapshots.sqlite3"))
+    yield store
+    store.close()
+
+
+def test_concurrent_requests_are_coalesced(server):
+    server.delay = 0.2
+    cache = PollCache()
+    polls = asyncio.run(cache.aget_many([make_poll() for _ in range(5)]))
+    assert all(poll is polls[0] for poll in polls)
+    assert server.requests["poll0"] == 1
+
+
+def test_expired_polls_are_fetched_again(server):
+    cache = PollCache(ttl=0.1, serve_stale=False)
+    poll = make_poll()
+    assert cache.get(poll) is poll
+    assert cache.get(poll) is poll
+    assert server.requests["poll0"] == 1
+    time.sleep(0.15)
+    assert cache.get(poll) is poll
+    assert server.requests["poll0"] == 2
+
+
+def test_least_recently_used_polls_are_evicted(server):
+    cache = PollCache(max_size=2)
+    for poll_uri in ["poll0", "poll1", "poll0", "poll2"]:
+        cache.get(make_poll(poll_uri))
+    assert len(cache) == 2
+    assert "poll0" in cache and "poll2" in cache
+    assert "poll1" not in cache
+
+
+def test_stale_polls_are_served_while_revalidated(server):
+    cache = PollCache(ttl=0.1, serve_stale=True)
+    poll = cache.get(make_poll())
+    digest = poll.poll_data_digest
+    time.sleep(0.15)
+    server.bodies["poll0"] = server.bodies["poll1"]
+    server.delay = 0.3
+    start = time.perf_counter()
+    assert cache.get(make_poll()) is poll
+    assert time.perf_counter() - start < server.delay
+    assert poll.poll_data_digest == digest
+    # Joins the revalidation instead of starting another fetch
+    assert cache._submit(poll, force=True).result() is poll
+    assert server.requests["poll0"] == 2
+    assert poll.poll_data_digest != digest
+    assert cache.get(make_poll()) is poll
+
+
+def test_warm_start_from_snapshot_without_fetch(server, store):
+    fetched = PollCache(store=store).get(make_poll())
+    cache = PollCache(store=store)
+    restored, missing = asyncio.run(
+        cache.aget_many([make_poll(), make_poll("poll1")], fetch=False)
+    )
+    assert missing is None
+    assert restored.is_loaded
+    assert restored.poll_data_digest == fetched.poll_data_digest
+    assert [day.date for day in restored.days] == [day.date for day in fetched.days]
+    assert "poll0" in cache and "poll1" not in cache
+    assert server.requests == {"poll0": 1}
+
+
+def test_restored_polls_are_served_while_the_backend_fails(server, store):
+    fetched = PollCache(store=store).get(make_poll())
+    server.statuses["poll0"] = [503] * 10
+    cache = PollCache(store=store, serve_stale=True)
+    restored = cache.get(make_poll())
+    assert restored.poll_data_digest == fetched.poll_data_digest
+    # Fetched in the background, retrying with backoff
+    with pytest.raises(aiohttp.ClientResponseError):
+        cache._inflight["poll0"].result()
+    # Still served, as an expired entry
+    assert cache.get(make_poll()) is restored
+    with pytest.raises(aiohttp.ClientResponseError):
+        cache._inflight["poll0"].result()
+
+
+def test_restored_polls_are_fetched_without_serve_stale(server, store):
+    PollCache(store=store).get(make_poll())
+    server.bodies["poll0"] = server.bodies["poll1"]
+    poll = PollCache(store=store, serve_stale=False).get(make_poll())
+    assert server.requests["poll0"] == 2
+    assert poll.poll_data_digest == PollCache().get(make_poll("poll1")).poll_data_digest
+    assert store.load("poll0").digest == poll.poll_data_digest
+
+
+def test_invalidated_fetch_in_flight_is_not_cached(server):
+    cache = PollCache(serve_stale=False)
+    old = cache.get(make_poll(title="old"))
+    server.delay = 0.3
+    in_flight = cache._submit(old, force=True)
+    # The configuration of the poll changed while it is fetched
+    cache.invalidate("poll0")
+    new = make_poll(title="new")
+    assert in_flight.result() is old
+    assert "poll0" not in cache
+    server.delay = 0.0
+    for _ in range(3):
+        result, = asyncio.run(cache.refresh([new]))
+        assert result is new
+    assert cache.get(make_poll(title="other")) is new
+    assert [poll.title for poll in asyncio.run(cache.refresh())] == ["new"]
+
+
+def test_invalidated_fetch_in_flight_is_not_persisted(server, store, tmp_path):
+    history = HistoryStore(str(tmp_path / "history"))
+    cache = PollCache(serve_stale=False, store=store, history=history)
+    old = cache.get(make_poll(title="old"))
+    rows = len(history.query("poll0"))
+    server.bodies["poll0"] = server.bodies["poll1"]
+    server.delay = 0.3
+    in_flight = cache._submit(old, force=True)
+    cache.invalidate("poll0")
+    assert in_flight.result().poll_data_digest != store.load("poll0").digest
+    assert len(history.query("poll0")) == rows
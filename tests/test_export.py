@@ -0,0 +1,63 @@
+import json
+import logging
+from datetime import date
+
+import pytest
+
+import core
+from benchmarks.generator import make_poll_csv
+from benchmarks.stub_server import StubServer
+from core import FramadatePoll, PollDataParser, PollType
+from export import HTML_FILE, JSON_FILE, export
+from fetcher import PollFetcher
+from timeline import EntryStore
+
+POLL_URIS = ["poll0", "poll1"]
+
+
+@pytest.fixture
+def server(monkeypatch):
+    bodies = {
+        poll_uri: make_poll_csv(participants=5, days=2, start=date.today(), seed=ii)
+        for ii, poll_uri in enumerate(POLL_URIS)
+    }
+    with StubServer(bodies) as server:
+        fetcher = PollFetcher(
+            server.base_url, retries=0, parser_factory=PollDataParser
+        )
+        monkeypatch.setattr(core, "_fetcher", fetcher)
+        yield server
+        fetcher.close()
+
+
+def make_polls():
+    return [
+        FramadatePoll(poll_uri=poll_uri, title=poll_uri, poll_type=PollType.booth)
+        for poll_uri in POLL_URIS
+    ]
+
+
+def exported_titles(output_dir) -> list:
+    with open(output_dir / JSON_FILE, encoding="utf-8") as f:
+        return sorted({entry["title"] for entry in json.load(f)["entries"]})
+
+
+def test_missing_poll_is_skipped(tmp_path, server, caplog):
+    del server.bodies["poll1"]
+    with caplog.at_level(logging.WARNING):
+        entries = export(make_polls(), str(tmp_path))
+    assert len(entries) == 2
+    assert exported_titles(tmp_path) == ["poll0"]
+    assert (tmp_path / HTML_FILE).exists()
+    assert [record.getMessage().split(":")[0] for record in caplog.records] == [
+        "Skipping poll1",
+    ]
+
+
+def test_missing_poll_keeps_its_previous_entries(tmp_path, server):
+    entry_store = EntryStore()
+    polls = make_polls()
+    assert len(export(polls, str(tmp_path), entry_store)) == 4
+    del server.bodies["poll1"]
+    assert len(export(polls, str(tmp_path), entry_store)) == 4
+    assert exported_titles(tmp_path) == POLL_URIS
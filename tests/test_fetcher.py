@@ -0,0 +1,117 @@
+import asyncio
+import time
+
+import aiohttp
+import pytest
+
+from benchmarks.generator import make_poll_csv
+from benchmarks.stub_server import StubServer
+from fetcher import PollFetcher
+
+POLL_URIS = [f"poll{ii}" for ii in range(8)]
+
+
+@pytest.fixture
+def server():
+    bodies = {
+        poll_uri: make_poll_csv(participants=5, days=2, seed=ii)
+        for ii, poll_uri in enumerate(POLL_URIS)
+    }
+    with StubServer(bodies) as server:
+        yield server
+
+
+@pytest.fixture
+def make_fetcher(server):
+    fetchers = []
+
+    def make_fetcher(**kwargs) -> PollFetcher:
+        fetcher = PollFetcher(server.base_url, **kwargs)
+        fetchers.append(fetcher)
+        return fetcher
+
+    yield make_fetcher
+    for fetcher in fetchers:
+        fetcher.close()
+
+
+def timed_fetch(fetcher: PollFetcher, poll_uris):
+    start = time.perf_counter()
+    results = fetcher.fetch_results(poll_uris)
+    return results, time.perf_counter() - start
+
+
+def test_concurrency_is_bounded(server, make_fetcher):
+    server.delay = 0.1
+    results, _ = timed_fetch(make_fetcher(concurrency=3), POLL_URIS)
+    assert [result.text for result in results] == [
+        server.bodies[poll_uri] for poll_uri in POLL_URIS
+    ]
+    assert server.max_active == 3
+
+
+def test_concurrent_fetches_are_faster(server, make_fetcher):
+    server.delay = 0.1
+    _, sequential = timed_fetch(make_fetcher(concurrency=1), POLL_URIS)
+    _, concurrent = timed_fetch(make_fetcher(concurrency=8), POLL_URIS)
+    assert sequential >= len(POLL_URIS) * server.delay
+    assert concurrent < sequential / 3
+
+
+def test_server_errors_are_retried_with_backoff(server, make_fetcher):
+    server.statuses["poll0"] = [503, 500]
+    results, elapsed = timed_fetch(make_fetcher(retries=2, backoff=0.1), ["poll0"])
+    assert results[0].text == server.bodies["poll0"]
+    assert server.requests["poll0"] == 3
+    # Waiting backoff, then twice the backoff
+    assert elapsed >= 0.1 + 0.2
+
+
+def test_rate_limiting_is_retried(server, make_fetcher):
+    server.statuses["poll0"] = [429]
+    results, _ = timed_fetch(make_fetcher(retries=1, backoff=0.0), ["poll0"])
+    assert results[0].text == server.bodies["poll0"]
+    assert server.requests["poll0"] == 2
+
+
+def test_retries_are_limited(server, make_fetcher):
+    server.statuses["poll0"] = [503] * 3
+    with pytest.raises(aiohttp.ClientResponseError) as error:
+        make_fetcher(retries=1, backoff=0.0).fetch_results(["poll0"])
+    assert error.value.status == 503
+    assert server.requests["poll0"] == 2
+
+
+@pytest.mark.parametrize("status", [403, 404])
+def test_client_errors_are_not_retried(server, make_fetcher, status):
+    server.statuses["poll0"] = [status]
+    with pytest.raises(aiohttp.ClientResponseError) as error:
+        make_fetcher(retries=2, backoff=0.0).fetch_results(["poll0"])
+    assert error.value.status == status
+    assert server.requests["poll0"] == 1
+
+
+def test_requests_time_out(server, make_fetcher):
+    server.delay = 1.0
+    fetcher = make_fetcher(timeout=0.2, retries=0)
+    start = time.perf_counter()
+    with pytest.raises(asyncio.TimeoutError):
+        fetcher.fetch_results(["poll0"])
+    assert time.perf_counter() - start < server.delay
+
+
+def test_unchanged_export_is_not_modified(server, make_fetcher):
+    fetcher = make_fetcher()
+    first, = fetcher.fetch_results(["poll0"])
+    assert first.etag is not None
+    assert not first.not_modified and first.changed
+
+    second, = fetcher.fetch_results(["poll0"])
+    assert second.not_modified and not second.changed
+    assert second.text == first.text
+    assert second.digest == first.digest
+
+    server.bodies["poll0"] = server.bodies["poll1"]
+    third, = fetcher.fetch_results(["poll0"])
+    assert not third.not_modified and third.changed
+    assert third.text == server.bodies["poll1"]
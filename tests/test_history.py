@@ -0,0 +1,143 @@
+import os
+from datetime import date
+
+import numpy as np
+import pytest
+
+from core import FramadatePoll, PollType
+from history import COLUMNS, HistoryStore
+
+SLOTS = [("2099-01-01", "08:00"), ("2099-01-01", "10:00"), ("2099-01-02", "08:00")]
+FIRST_DAY = date(2099, 1, 1)
+
+
+def make_csv(responses: dict) -> str:
+    lines = [
+        '"",' + ",".join(f'"{date_}"' for date_, _ in SLOTS) + ",",
+        '"",' + ",".join(f'"{time_}"' for _, time_ in SLOTS) + ",",
+    ]
+    lines += ['"",' + ",".join('""' for _ in SLOTS) + ","] * 2
+    for name, values in responses.items():
+        lines.append(f'"{name}",' + ",".join(f'"{value}"' for value in values) + ",")
+    return "\n".join(lines) + "\n"
+
+
+BEFORE = make_csv({
+    "Anna": ["Ja", "Ja", "Nein"],
+    "Ben": ["Ja", "Unter Vorbehalt", "Nein"],
+})
+AFTER = make_csv({
+    "Anna": ["Ja", "Ja", "Nein"],
+    "Ben": ["Ja", "Ja", "Nein"],
+})
+
+
+@pytest.fixture
+def poll():
+    poll = FramadatePoll(
+        poll_uri="poll", title="Aktion", poll_type=PollType.booth, minimum_staff=2,
+        total_workforce=3, poll_data=BEFORE,
+    )
+    poll.process_poll_data()
+    return poll
+
+
+@pytest.fixture
+def recorded(tmp_path, poll):
+    """History of the poll fetched at 100, unchanged at 200 and changed at 300"""
+    store = HistoryStore(str(tmp_path))
+    assert store.record(poll, recorded_at=100) == len(SLOTS)
+    assert store.record(poll, recorded_at=200) == 0
+    poll.set_poll_data(AFTER)
+    # Only Ben's response in the second time slot changed
+    assert store.record(poll, recorded_at=300) == 1
+    return store
+
+
+def test_unchanged_fetches_append_no_rows(recorded, poll):
+    history = recorded.query("poll")
+    assert list(history.recorded_at) == [100, 100, 100, 300]
+    assert [history.slots[slot] for slot in history.slot] == [
+        "2099-01-01 08:00", "2099-01-01 10:00", "2099-01-02 08:00",
+        "2099-01-01 10:00",
+    ]
+    assert list(history.total) == [2.0, 1.5, 0.0, 2.0]
+    assert recorded.record(poll, recorded_at=400) == 0
+
+
+def test_history_is_reloaded_from_disk(tmp_path, recorded, poll):
+    reloaded = HistoryStore(str(tmp_path))
+    history, expected = reloaded.query("poll"), recorded.query("poll")
+    assert history.slots == expected.slots
+    for name in COLUMNS:
+        assert np.array_equal(getattr(history, name), getattr(expected, name))
+    # The latest tallies are restored for the delta encoding
+    assert reloaded.record(poll, recorded_at=400) == 0
+    poll.set_poll_data(BEFORE)
+    assert reloaded.record(poll, recorded_at=500) == 1
+
+
+def test_interrupted_append_is_truncated(tmp_path, recorded, poll):
+    directory = tmp_path / "poll"
+    # An append that was interrupted after writing two of the columns
+    for name in ["recorded_at", "slot"]:
+        with open(directory / name, "ab") as f:
+            np.array([400], dtype=COLUMNS[name]).tofile(f)
+    reloaded = HistoryStore(str(tmp_path))
+    assert len(reloaded.query("poll")) == 4
+    for name, dtype in COLUMNS.items():
+        assert os.path.getsize(directory / name) == 4 * np.dtype(dtype).itemsize
+    poll.set_poll_data(BEFORE)
+    assert reloaded.record(poll, recorded_at=500) == 1
+    assert list(reloaded.query("poll").recorded_at) == [100, 100, 100, 300, 500]
+
+
+def test_query_filters(recorded):
+    assert len(recorded.query("poll", start=date(2099, 1, 2))) == 1
+    assert len(recorded.query("poll", end=FIRST_DAY)) == 3
+    assert len(recorded.query("poll", start=FIRST_DAY, end=FIRST_DAY)) == 3
+    history = recorded.query("poll", slot="2099-01-01 10:00")
+    assert list(history.positives) == [1, 2]
+    assert list(history.maybes) == [1, 0]
+    assert len(recorded.query("poll", slot="2099-01-03 08:00")) == 0
+    assert list(recorded.query("poll", since=200).recorded_at) == [300]
+    assert list(recorded.query("poll", until=300).recorded_at) == [100, 100, 100]
+    assert len(recorded.query("poll", since=100, until=100)) == 0
+    assert len(recorded.query("unknown")) == 0
+
+
+def test_day_totals(recorded):
+    times, totals = recorded.day_totals("poll", FIRST_DAY)
+    assert list(times) == [100, 300]
+    assert list(totals) == [3.5, 4.0]
+    times, totals = recorded.day_totals("poll", FIRST_DAY, until=300)
+    assert list(times) == [100]
+    assert list(totals) == [3.5]
+    times, totals = recorded.day_totals("poll", date(2099, 1, 3))
+    assert len(times) == len(totals) == 0
+
+
+def test_day_totals_since(recorded):
+    # Time slots recorded before since start with their tally as of since
+    times, totals = recorded.day_totals("poll", FIRST_DAY, since=200)
+    assert list(times) == [200, 300]
+    assert list(totals) == [3.5, 4.0]
+    times, totals = recorded.day_totals("poll", FIRST_DAY, since=300)
+    assert list(times) == [300]
+    assert list(totals) == [4.0]
+    times, totals = recorded.day_totals("poll", FIRST_DAY, since=50)
+    assert list(times) == [100, 300]
+    assert list(totals) == [3.5, 4.0]
+
+
+@pytest.mark.parametrize("kept", [0, 1])
+def test_rows_of_unknown_slots_are_truncated(tmp_path, recorded, poll, kept):
+    slots_file = tmp_path / "poll" / "slots.txt"
+    lines = slots_file.read_text(encoding="utf-8").splitlines(keepends=True)
+    slots_file.write_text("".join(lines[:kept]), encoding="utf-8")
+    reloaded = HistoryStore(str(tmp_path))
+    # The second row is the first one of a lost time slot
+    assert len(reloaded.query("poll")) == kept
+    assert reloaded.record(poll, recorded_at=400) == len(SLOTS) - kept
+    history = reloaded.query("poll")
+    assert list(history.recorded_at) == [100] * kept + [400] * (len(SLOTS) - kept)
@@ -0,0 +1,36 @@
+import asyncio
+
+import pytest
+from tornado.httpclient import AsyncHTTPClient
+from tornado.httpserver import HTTPServer
+from tornado.netutil import bind_sockets
+from tornado.web import Application
+
+import metrics
+from metrics import PROMETHEUS_CONTENT_TYPE, PROMETHEUS_PREFIX, ROUTES, Metrics
+
+
+async def scrape():
+    sockets = bind_sockets(0, "127.0.0.1")
+    server = HTTPServer(Application(ROUTES))
+    server.add_sockets(sockets)
+    port = sockets[0].getsockname()[1]
+    try:
+        return await AsyncHTTPClient().fetch(f"http://127.0.0.1:{port}/metrics")
+    finally:
+        server.stop()
+
+
+@pytest.mark.parametrize("enabled", [True, False])
+def test_metrics_route(monkeypatch, enabled):
+    monkeypatch.setattr(metrics, "_metrics", Metrics(enabled=enabled))
+    metrics.get_metrics().increment("fetches", 3)
+    metrics.get_metrics().record("parse", 0.5)
+    response = asyncio.run(scrape())
+    assert response.headers["Content-Type"] == PROMETHEUS_CONTENT_TYPE
+    body = response.body.decode("utf-8")
+    assert body == metrics.get_metrics().to_prometheus()
+    # Disabled metrics serve the type declarations only
+    assert (f"{PROMETHEUS_PREFIX}_fetches_total 3" in body) == enabled
+    parse_sum = f'{PROMETHEUS_PREFIX}_stage_seconds_sum{{stage="parse"}} 0.5'
+    assert (parse_sum in body) == enabled
@@ -0,0 +1,49 @@
+import os
+
+import panel
+import pytest
+from bokeh.application.handlers import ScriptHandler
+from bokeh.document import Document
+
+import broadcast
+import metrics
+import poll_set
+from poll_set import PollSet
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "panels_app.py")
+
+
+@pytest.fixture
+def polls_path(tmp_path, monkeypatch):
+    path = tmp_path / "polls.yaml"
+    path.write_text("[]\n", encoding="utf-8")
+    monkeypatch.setattr(poll_set, "_poll_set", PollSet(str(path)))
+    monkeypatch.setattr(broadcast, "_broadcaster", None)
+    monkeypatch.setattr(panel.state, "_scheduled", {})
+    return path
+
+
+def test_app_loads(polls_path):
+    handler = ScriptHandler(filename=APP_PATH)
+    handler.modify_document(Document())
+    assert not handler.failed, handler.error_detail
+    assert sorted(key.split("_", 1)[1] for key in panel.state._scheduled) == [
+        "refresh-timelines", "reload-polls",
+    ]
+    # Every session schedules the tasks of the process only once
+    handler.modify_document(Document())
+    assert not handler.failed, handler.error_detail
+    assert len(panel.state._scheduled) == 2
+
+
+@pytest.mark.parametrize("value, enabled", [("1", True), ("0", False), (None, False)])
+def test_metrics_switch(polls_path, monkeypatch, value, enabled):
+    monkeypatch.setattr(metrics, "_metrics", None)
+    if value is None:
+        monkeypatch.delenv("DASHBOARD_METRICS", raising=False)
+    else:
+        monkeypatch.setenv("DASHBOARD_METRICS", value)
+    handler = ScriptHandler(filename=APP_PATH)
+    handler.modify_document(Document())
+    assert not handler.failed, handler.error_detail
+    assert metrics.get_metrics().enabled == enabled
@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+from core import PollDataParser, Response, parse_poll_data
+
+LINES = [
+    '"","2099-01-01","2099-01-01","2099-01-02",',
+    '"","08:00","10:00","08:00",',
+    '"","","","",',
+    '"","","","",',
+    '"Müller, Anna","Ja","Nein","Unter Vorbehalt",',
+    '"Ben ""der Große""\nvom Infostand","Yes","Under reserve","No",',
+    '"Ça va, €uro","Unbekannt","Ja","Ja",',
+]
+CSV = "\n".join(LINES) + "\n"
+CRLF_CSV = "\r\n".join(LINES) + "\r\n"
+"""Line breaks inside the quoted name stay as they are"""
+PARTICIPANTS = ["Müller, Anna", 'Ben "der Große"\nvom Infostand', "Ça va, €uro"]
+RESPONSES = [
+    [Response.JA, Response.NEIN, Response.UNTERVORBEHALT],
+    [Response.YES, Response.UNDERRESERVE, Response.NO],
+    [Response.UNBEKANNT, Response.JA, Response.JA],
+]
+
+
+def responses(parsed) -> list:
+    return [
+        [Response(value) for value in row]
+        for row in parsed.to_dataframe().values[:, 1:]
+    ]
+
+
+def assert_expected(parsed) -> None:
+    assert parsed.columns == [
+        "2099-01-01 08:00", "2099-01-01 10:00", "2099-01-02 08:00",
+    ]
+    assert parsed.participants == PARTICIPANTS
+    assert responses(parsed) == RESPONSES
+    assert list(parsed.positives) == [2, 1, 1]
+    assert list(parsed.maybes) == [0, 1, 1]
+
+
+def test_quoted_commas_and_newlines():
+    assert_expected(parse_poll_data(CSV))
+
+
+def test_crlf_line_endings():
+    assert_expected(parse_poll_data(CRLF_CSV))
+
+
+@pytest.mark.parametrize("csv", [CSV, CRLF_CSV])
+@pytest.mark.parametrize("size", [1, 2, 3, 5, 7, 13, 64])
+def test_chunk_boundaries(csv, size):
+    data = csv.encode("utf-8")
+    # Splits multibyte characters, quoted fields and CRLF pairs across chunks
+    assert_expected(
+        parse_poll_data(data[ii:ii + size] for ii in range(0, len(data), size))
+    )
+    text = data.decode("utf-8")
+    assert_expected(
+        parse_poll_data(text[ii:ii + size] for ii in range(0, len(text), size))
+    )
+
+
+def test_every_split_of_the_bytes():
+    data = CSV.encode("utf-8")
+    expected = parse_poll_data(CSV)
+    for ii in range(len(data) + 1):
+        parser = PollDataParser()
+        parser.feed(data[:ii])
+        parser.feed(data[ii:])
+        parsed = parser.close()
+        assert parsed.participants == expected.participants
+        assert np.array_equal(parsed.codes, expected.codes)
@@ -0,0 +1,110 @@
+import pytest
+
+from benchmarks.generator import make_poll_csv
+from core import FramadatePoll, PollType, decide_statuses
+from status import StatusThresholds
+
+POLL_CONFIGS = {
+    "booth": dict(poll_type=PollType.booth, minimum_staff=2, total_workforce=3),
+    "booth_without_total_workforce": dict(poll_type=PollType.booth, minimum_staff=2),
+    "poster": dict(poll_type=PollType.poster, person_hours=60),
+    "poster_per_day": dict(poll_type=PollType.poster, person_hours_per_day=8),
+    # Ratios x / 0 are fully staffed, 0 / 0 understaffed
+    "booth_without_minimum_staff": dict(
+        poll_type=PollType.booth, minimum_staff=0, total_workforce=3
+    ),
+    "poster_without_person_hours": dict(poll_type=PollType.poster, person_hours=0),
+    "poster_without_person_hours_per_day": dict(
+        poll_type=PollType.poster, person_hours_per_day=0
+    ),
+}
+THRESHOLDS = [
+    None,
+    StatusThresholds(yellow=0.25, blue=0.75),
+    StatusThresholds(yellow=0.5, blue=1.5),
+]
+
+
+def make_poll(config: str, poll_data: str, **kwargs) -> FramadatePoll:
+    return FramadatePoll(
+        poll_uri="poll", title="Aktion", poll_data=poll_data,
+        **POLL_CONFIGS[config], **kwargs,
+    )
+
+
+def make_csv(seed: int, participants: int = 4) -> str:
+    # Few participants, so that the time slots and days get all statuses
+    return make_poll_csv(
+        participants=participants, days=5, slots_per_day=4, english_share=0.5,
+        seed=seed,
+    )
+
+
+def snapshot(poll: FramadatePoll) -> list:
+    """All processed values of the poll, in comparable form"""
+    values = [(poll.status, poll.total_workforce)]
+    for day in poll.days:
+        values.append((day.date, day.status))
+        values += [
+            (
+                time_slot.string, time_slot.start_time, time_slot.end_time,
+                time_slot.duration, time_slot.polled, time_slot.positives,
+                time_slot.maybes, time_slot.total, time_slot.status,
+            )
+            for time_slot in day.time_slots
+        ]
+    return values
+
+
+@pytest.mark.parametrize("config", POLL_CONFIGS)
+@pytest.mark.parametrize("seed", range(4))
+@pytest.mark.parametrize("thresholds", THRESHOLDS)
+def test_vectorized_matches_per_cell(config, seed, thresholds):
+    csv = make_csv(seed)
+    vectorized = make_poll(config, csv, thresholds=thresholds)
+    vectorized.process_poll_data()
+    per_cell = make_poll(config, csv, thresholds=thresholds)
+    per_cell.process_poll_data(vectorized=False)
+    assert snapshot(vectorized) == snapshot(per_cell)
+
+
+@pytest.mark.parametrize("config", POLL_CONFIGS)
+@pytest.mark.parametrize("participants", [3, 4, 6])
+def test_incremental_matches_full(config, participants):
+    poll = make_poll(config, make_csv(0))
+    poll.process_poll_data()
+    # Changes the responses of the common participants, adding or removing others
+    csv = make_csv(1, participants)
+    poll.set_poll_data(csv)
+    per_cell = make_poll(config, csv)
+    per_cell.process_poll_data(vectorized=False)
+    assert snapshot(poll) == snapshot(per_cell)
+
+
+@pytest.mark.parametrize("thresholds", THRESHOLDS[1:])
+def test_batched_statuses_match_per_day(thresholds):
+    polls = [
+        make_poll(config, make_csv(seed)) for seed, config in enumerate(POLL_CONFIGS)
+    ]
+    for poll in polls:
+        poll.process_poll_data()
+        poll.thresholds = thresholds
+    # Re-evaluate all polls at once after the thresholds changed
+    decide_statuses(polls)
+    for (seed, config), poll in zip(enumerate(POLL_CONFIGS), polls):
+        per_day = make_poll(config, make_csv(seed), thresholds=thresholds)
+        per_day.process_poll_data(vectorized=False)
+        assert snapshot(poll) == snapshot(per_day)
+
+
+@pytest.mark.parametrize("config", POLL_CONFIGS)
+def test_table_backed_days_dump_like_models(config):
+    vectorized = make_poll(config, make_csv(0))
+    vectorized.process_poll_data()
+    per_cell = make_poll(config, make_csv(0))
+    per_cell.process_poll_data(vectorized=False)
+    for day, reference in zip(vectorized.days, per_cell.days, strict=True):
+        dumped = day.model_dump()
+        assert all(isinstance(time_slot, dict) for time_slot in dumped["time_slots"])
+        assert dumped == reference.model_dump()
+        assert day.model_dump_json() == reference.model_dump_json()
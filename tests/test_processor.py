@@ -0,0 +1,87 @@
+import logging
+
+import aiohttp
+import pytest
+
+import core
+import processing
+from benchmarks.generator import make_poll_csv
+from benchmarks.stub_server import StubServer
+from core import FramadatePoll, PollDataParser, PollType, parse_poll_data
+from fetcher import PollFetcher
+from processing import MODES, PollProcessor
+
+POLL_URIS = ["poll0", "missing", "invalid", "poll1"]
+
+
+@pytest.fixture
+def server(monkeypatch):
+    bodies = {
+        "poll0": make_poll_csv(participants=5, days=2, seed=0),
+        "invalid": '"Nur eine Zeile"\n',
+        "poll1": make_poll_csv(participants=5, days=2, seed=1),
+    }
+    with StubServer(bodies) as server:
+        fetcher = PollFetcher(
+            server.base_url, retries=0, parser_factory=PollDataParser
+        )
+        monkeypatch.setattr(core, "_fetcher", fetcher)
+        yield server
+        fetcher.close()
+
+
+@pytest.fixture(params=MODES)
+def processor(request):
+    processor = PollProcessor(request.param, workers=2)
+    yield processor
+    processor.close()
+
+
+def make_polls():
+    return [
+        FramadatePoll(poll_uri=poll_uri, title="Aktion", poll_type=PollType.booth)
+        for poll_uri in POLL_URIS
+    ]
+
+
+def test_failed_polls_do_not_affect_the_others(server, processor):
+    polls = make_polls()
+    results = processor.process(polls, return_exceptions=True)
+    assert results[0] is polls[0] and results[3] is polls[3]
+    assert isinstance(results[1], aiohttp.ClientResponseError)
+    assert results[1].status == 404
+    assert isinstance(results[2], ValueError)
+    assert polls[0].is_loaded and polls[3].is_loaded
+    assert not polls[1].is_loaded and not polls[2].is_loaded
+
+
+def test_first_failure_is_raised_after_processing_the_others(server, processor):
+    polls = make_polls()
+    with pytest.raises(aiohttp.ClientResponseError):
+        processor.process(polls)
+    assert polls[0].is_loaded and polls[3].is_loaded
+
+
+def test_fall_back_is_logged_once(caplog):
+    processor = PollProcessor("thread")
+    with caplog.at_level(logging.WARNING, logger="processing"):
+        processor._fall_back(RuntimeError("broken"))
+        processor._fall_back(RuntimeError("broken"))
+    assert processor.mode == "inline"
+    assert [record.getMessage() for record in caplog.records] == [
+        "Parsing inline, the thread pool failed: RuntimeError('broken')",
+    ]
+
+
+def test_inline_exports_are_parsed_while_streaming(server, monkeypatch):
+    parsed = []
+    monkeypatch.setattr(
+        processing, "parse_poll_data",
+        lambda text: parsed.append(text) or parse_poll_data(text),
+    )
+    processor = PollProcessor("inline")
+    polls = make_polls()
+    processor.process(polls, return_exceptions=True)
+    assert polls[0].is_loaded and polls[3].is_loaded
+    # Only the invalid export, which the streaming parser gave up on
+    assert parsed == [server.bodies["invalid"]]
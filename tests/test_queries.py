@@ -0,0 +1,87 @@
+from datetime import date
+
+import pytest
+
+from core import FramadatePoll, PollType, Response
+
+EARLY, LATE, NEXT_DAY = "2099-01-01 08:00", "2099-01-01 10:00", "2099-01-02 08:00"
+CSV = "\n".join([
+    '"","2099-01-01","2099-01-01","2099-01-02",',
+    '"","08:00","10:00","08:00",',
+    '"","","","",',
+    '"","","","",',
+    '"Anna","Ja","Nein","Unter Vorbehalt",',
+    '"Ben","Nein","Ja","Nein",',
+    '"Anna","Nein","Nein","Ja",',
+    '"Carla","Unter Vorbehalt","Nein","Nein",',
+]) + "\n"
+"""Anna signed up twice under the same name; the totals are 1.5, 1 and 1.5"""
+
+
+@pytest.fixture(params=[True, False], ids=["vectorized", "per_cell"])
+def poll(request):
+    poll = FramadatePoll(
+        poll_uri="poll", title="Aktion", poll_type=PollType.booth, minimum_staff=2,
+        total_workforce=3, poll_data=CSV,
+    )
+    poll.process_poll_data(vectorized=request.param)
+    return poll
+
+
+def strings(time_slots) -> list:
+    return [time_slot.string for time_slot in time_slots]
+
+
+def test_slots_of_participant(poll):
+    # All rows of a repeated name
+    assert strings(poll.slots_of_participant("Anna")) == [EARLY, NEXT_DAY]
+    assert strings(poll.slots_of_participant("Anna", include_maybe=False)) == [
+        EARLY, NEXT_DAY,
+    ]
+    assert strings(poll.slots_of_participant("Carla")) == [EARLY]
+    assert poll.slots_of_participant("Carla", include_maybe=False) == []
+    assert poll.slots_of_participant("Dora") == []
+
+
+def test_participants_available(poll):
+    assert poll.participants_available(date(2099, 1, 1)) == ["Anna", "Ben", "Carla"]
+    assert poll.participants_available(date(2099, 1, 1), include_maybe=False) == [
+        "Anna", "Ben",
+    ]
+    # One entry per row of a repeated name
+    assert poll.participants_available(date(2099, 1, 2)) == ["Anna", "Anna"]
+    assert poll.participants_available(date(2099, 1, 3)) == []
+
+
+def test_participants_of_slot(poll):
+    assert poll.participants_of_slot(EARLY) == ["Anna", "Carla"]
+    assert poll.participants_of_slot(EARLY, include_maybe=False) == ["Anna"]
+    assert poll.participants_of_slot(LATE) == ["Ben"]
+    assert poll.participants_of_slot("2099-01-03 08:00") == []
+
+
+def test_slots_short_of_staff(poll):
+    assert strings(poll.slots_short_of_staff()) == [EARLY, LATE, NEXT_DAY]
+    assert strings(poll.slots_short_of_staff(missing=0.5)) == [EARLY, NEXT_DAY]
+    poll.minimum_staff = None
+    assert poll.slots_short_of_staff() == []
+
+
+def test_response_of(poll):
+    # The first row of a repeated name
+    assert poll.response_of("Anna", NEXT_DAY) == Response.UNTERVORBEHALT
+    assert poll.response_of("Anna", EARLY) == Response.JA
+    assert poll.response_of("Ben", LATE) == Response.JA
+    assert poll.response_of("Carla", EARLY) == Response.UNTERVORBEHALT
+    assert poll.response_of("Dora", EARLY) is None
+    assert poll.response_of("Ben", "2099-01-03 08:00") is None
+
+
+def test_queries_follow_updates(poll):
+    assert poll.participants_of_slot(LATE) == ["Ben"]
+    poll.set_poll_data(
+        CSV.replace('"Carla","Unter Vorbehalt","Nein"', '"Carla","Nein","Ja"')
+    )
+    assert poll.participants_of_slot(LATE) == ["Ben", "Carla"]
+    assert poll.response_of("Carla", LATE) == Response.JA
+    assert strings(poll.slots_short_of_staff()) == [EARLY, NEXT_DAY]
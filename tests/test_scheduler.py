@@ -0,0 +1,113 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from core import FramadatePoll, PollType
+from scheduler import RefreshScheduler
+
+DAY = datetime(2099, 1, 1)
+
+
+def make_poll(poll_uri: str = "poll", slots=None) -> FramadatePoll:
+    """Poll with a single participant available in the given "<date> <time>" time
+    slots, processed unless there are none"""
+    poll = FramadatePoll(poll_uri=poll_uri, title="Aktion", poll_type=PollType.booth)
+    if slots:
+        dates, times = zip(*(slot.split(" ") for slot in slots))
+        poll.poll_data = "\n".join([
+            '"",' + ",".join(f'"{date_}"' for date_ in dates) + ",",
+            '"",' + ",".join(f'"{time_}"' for time_ in times) + ",",
+            '"",' + ",".join('""' for _ in slots) + ",",
+            '"",' + ",".join('""' for _ in slots) + ",",
+            '"Anna",' + ",".join('"Ja"' for _ in slots) + ",",
+        ]) + "\n"
+        poll.process_poll_data()
+    return poll
+
+
+@pytest.fixture
+def scheduler():
+    return RefreshScheduler(
+        min_interval=30, max_interval=300, urgency_horizon=timedelta(days=14),
+        change_boost=3, budget=2, budget_period=60,
+    )
+
+
+def test_next_start():
+    poll = make_poll(slots=["2099-01-01 08:00", "2099-01-01 10:00"])
+    assert RefreshScheduler.next_start(make_poll(), DAY) is None
+    assert RefreshScheduler.next_start(poll, DAY) == DAY + timedelta(hours=8)
+    # A running time slot starts in the past
+    assert RefreshScheduler.next_start(poll, DAY + timedelta(hours=9)) == (
+        DAY + timedelta(hours=8)
+    )
+    # The last time slot of the day lasts an hour
+    assert RefreshScheduler.next_start(poll, DAY + timedelta(hours=10.5)) == (
+        DAY + timedelta(hours=10)
+    )
+    assert RefreshScheduler.next_start(poll, DAY + timedelta(hours=11.5)) is None
+
+
+def test_next_start_past_midnight():
+    poll = make_poll(slots=["2099-01-01 23:30", "2099-01-03 08:00"])
+    late = DAY + timedelta(hours=23, minutes=30)
+    assert RefreshScheduler.next_start(poll, DAY + timedelta(days=1, minutes=15)) == late
+    assert RefreshScheduler.next_start(poll, DAY + timedelta(days=1, minutes=45)) == (
+        DAY + timedelta(days=2, hours=8)
+    )
+
+
+def test_interval_shrinks_as_the_next_day_approaches(scheduler):
+    poll = make_poll(slots=["2099-01-15 08:00"])
+    start = DAY + timedelta(days=14, hours=8)
+    assert scheduler.interval(make_poll()) == 300
+    assert scheduler.interval(poll, start - timedelta(days=20)) == 300
+    assert scheduler.interval(poll, start - timedelta(days=7)) == 165
+    assert scheduler.interval(poll, start) == 30
+    assert scheduler.interval(poll, start + timedelta(minutes=30)) == 30
+
+
+def test_interval_shrinks_with_the_change_rate(scheduler):
+    poll = make_poll()
+    for changed in [True, False]:
+        scheduler.record(poll, changed, now=0)
+    assert scheduler.interval(poll) == 300 / (1 + 3 * 0.5)
+    for changed in [True, True]:
+        scheduler.record(poll, changed, now=0)
+    assert scheduler.interval(poll) == 300 / (1 + 3 * 0.75)
+    scheduler.change_window = 2
+    scheduler.record(poll, True, now=0)
+    assert scheduler.interval(poll) == 300 / (1 + 3)
+    # Never below the minimum interval
+    scheduler.max_interval = 60
+    assert scheduler.interval(poll) == 30
+
+
+def test_due_within_budget(scheduler):
+    rare, frequent, new = make_poll("rare"), make_poll("frequent"), make_poll("new")
+    scheduler.record(rare, changed=False, now=0)
+    scheduler.record(frequent, changed=True, now=0)
+    polls = [rare, frequent, new]
+    assert scheduler.schedule("rare").next_due == 300
+    assert scheduler.schedule("frequent").next_due == 75
+    assert scheduler.due(polls, now=10) == [new]
+    assert scheduler.due(polls, now=20) == [new]
+    # The budget of the period is spent
+    assert scheduler.due(polls, now=30) == []
+    # Never fetched first, then the most overdue relative to the interval
+    assert scheduler.due(polls, now=400) == [new, frequent]
+    scheduler.record(new, changed=False, now=400)
+    scheduler.record(frequent, changed=False, now=400)
+    assert scheduler.due(polls, now=1000) == [frequent, rare]
+
+
+def test_mark_due(scheduler):
+    polls = [make_poll("first"), make_poll("second")]
+    for poll in polls:
+        scheduler.record(poll, changed=False, now=0)
+    assert scheduler.due(polls, now=10) == []
+    scheduler.mark_due(["second", "unknown"], now=10)
+    assert scheduler.due(polls, now=10) == [polls[1]]
+    scheduler.mark_due(["first", "second"], now=20)
+    # The budget of the period allows a single fetch more
+    assert scheduler.due(polls, now=20) == [polls[0]]
@@ -0,0 +1,306 @@
+import functools
+from html import escape
+from pathlib import Path
+
+from pydantic import BaseModel, HttpUrl, PrivateAttr
+from typing import Dict, Iterable, List, Optional, Tuple
+from datetime import datetime, timedelta
+from pydantic.types import date
+
+from aggregation import DayKey, PollAggregation
+from core import (
+    FramadatePoll, LinkTarget, PolledDay, Status, Styling, Task, YELLOW, BLUE
+)
+from metrics import timed
+
+DEFAULT_DATA = {
+    "loading": True,
+    "card_title": "Aktuelle Aktionen",
+    "legend_title": "Statuslegende",
+    "understaffed": int(YELLOW*100),
+    "half_staffed": int(BLUE*100),
+    "full_staffed": int(BLUE*100),
+}
+DEFAULT_HORIZON = timedelta(days=180)
+"""How far into the future days are shown in the timeline"""
+DEFAULT_MAX_ENTRIES = 200
+"""Maximum number of entries shown in the timeline"""
+
+STATIC_DIR = Path(__file__).parent / "static"
+"""Static assets, resolved independently of the working directory"""
+TIMELINE_CSS = (STATIC_DIR / "timeline.css").read_text(encoding="utf-8")
+BOOTSTRAP_SUBSET_CSS = (STATIC_DIR / "bootstrap-subset.css").read_text(encoding="utf-8")
+
+PAGE_TITLE = "Grüne Würzburg-Stadt"
+INTRODUCTION = (
+    "Willkommen auf der Übersichtsseite zu Gemeinschaftsaktionen der Grünen "
+    "Würzburg-Stadt."
+)
+LEGEND_HTML = """<div class="legend">
+    <p>Statuslegende</p>
+    <ul>
+        <li><span class="dot dot-danger"></span>Unterbesetzt (&lt; 50 
+        %)</li>
+        <li><span class="dot dot-warning"></span>Halb besetzt (&lt; 80 
+        %)</li>
+        <li><span class="dot dot-primary"></span>Gut besetzt (&gt; 80 
+        %)</li>
+        <li><span class="dot dot-success"></span>Abgeschlossen</li>
+    </ul>
+</div>"""
+
+ENTRY_FIELDS_FROM_DAY = (
+    "poll_uri", "title", "date", "poll_url", "description", "status", "sub_tasks",
+    "signal_group_link", "google_maps_link",
+)
+"""Fields of a PolledDay that are rendered in its timeline entry"""
+
+
+RENDER_FIELDS = (
+    "status", "title", "description", "date", "poll_url", "poll_link_text",
+    "signal_group_link", "signal_group_link_text", "google_maps_link",
+    "header_tag", "body_tag", "link_target",
+)
+"""Fields of an Entry that affect its HTML, in the argument order of render_entry"""
+HTML_CACHE_SIZE = 1024
+"""Number of rendered entries kept by render_entry"""
+
+
+@functools.lru_cache(maxsize=HTML_CACHE_SIZE)
+@timed("render")
+def render_entry(
+        status: Status,
+        title: str,
+        description: Optional[str],
+        date_: date,
+        poll_url: Optional[HttpUrl],
+        poll_link_text: str,
+        signal_group_link: Optional[HttpUrl],
+        signal_group_link_text: str,
+        google_maps_link: Optional[str],
+        header_tag: Styling,
+        body_tag: Styling,
+        link_target: LinkTarget,
+) -> Tuple[str, str]:
+    """Render the links and the HTML of a timeline entry. Memoized, so entries are
+    only rendered again if one of their RENDER_FIELDS changed."""
+    link_list = [
+        f'<a href="{poll_url}" target="{link_target.value}">'
+        f'{poll_link_text}</a>'
+    ]
+    if signal_group_link:
+        link_list.append(
+            f'<a href="{signal_group_link}" target="{link_target.value}">'
+            f'{signal_group_link_text}</a>'
+        )
+    if google_maps_link:
+        link_list.append(
+            f'<a href="{google_maps_link}" target="{link_target.value}">'
+            f'{signal_group_link_text}</a>'
+        )
+    links = " | ".join(link_list)
+    html = f"""<div class="vertical-timeline-item vertical-timeline-element">
+                    <div>
+                        <span class="vertical-timeline-element-icon bounce-in">
+                            <i class="{status.value}"> </i>
+                        </span>
+                        <div class="vertical-timeline-element-content bounce-in">
+                            {header_tag.value.opener} {title} {header_tag.value.closer}
+                            {body_tag.value.opener} {description} {body_tag.value.closer}
+                            {body_tag.value.opener} {links} {body_tag.value.closer}
+                            <span class="vertical-timeline-element-date">{date_.strftime("%d.%m.%y")}</span>
+                        </div>
+                    </div>
+                </div>"""
+    return links, html
+
+
+def render_timeline(
+        data: dict, entries: Iterable[Tuple[str, str]], revision: int
+) -> str:
+    """Render the timeline with the given (id, html) entries, matching the template
+    of Timeline. The revision is stored with the HTML, so the frontend knows which
+    patch comes next."""
+    loading = "<p>Aktionen werden geladen …</p>" if data.get("loading") else ""
+    items = "\n".join(
+        f'<div data-entry-id="{escape(id_)}">{html}</div>' for id_, html in entries
+    )
+    return f"""<div class="dashboard row mt-20 mb-10">
+    <div>
+        <div class="main-card mb-3 card">
+            <div class="card-body">
+                <h4 class="card-title">{escape(str(data.get("card_title", "")))}</h4>
+                <div class="vertical-timeline vertical-timeline--animate 
+                vertical-timeline--one-column" data-revision="{revision}">
+                    {loading}
+{items}
+                </div>
+            </div>
+        </div>
+    </div>
+</div>"""
+
+
+class Entry(BaseModel):
+    """Class to represent a single day of an activity in the timeline"""
+
+    title: str
+    """Title of the activity entry"""
+    date: date
+    """Date of the activity entry"""
+    poll_uri: Optional[str] = None
+    """URI of the poll the entry belongs to"""
+    poll_url: Optional[HttpUrl] = None
+    """URL of the poll"""
+    poll_link_text: str = "Zur Umfrage"
+    """Display text of the poll link"""
+    description: Optional[str] = None
+    """Description of the activity"""
+    # todo: way / address description
+    status: Status
+    """Staffing and completion status indicator """
+    sub_tasks: Optional[List[Task]] = None
+    signal_group_link: Optional[HttpUrl] = None
+    """Link to the signal group of the activity"""
+    signal_group_link_text: str = "Zur Signal-Gruppe"
+    """Display text of the signal group link"""
+    google_maps_link: Optional[str] = None
+    """Coordinates of the location of the activity, to be used to create a google 
+    maps link."""  # todo: create google maps link (or map provider agnostic link)
+    google_maps_link_text: Optional[str] = "Zum Treffpunkt"
+    """Display text of the google maps link"""
+    header_tag: Optional[Styling] = Styling.h4
+    """Styling of the header, containing the title of the entry"""
+    body_tag: Optional[Styling] = Styling.p
+    """Styling of the body, containing the description of the entry, links and 
+    buttons"""
+    link_target: LinkTarget = LinkTarget.NEW
+    """Kind of action that should happen when clicking links in the entry"""
+    _links: Optional[str] = PrivateAttr(default="")
+    _html: Optional[str] = PrivateAttr(default="")
+    """HTML representation of the activity as a timeline entry"""
+
+    class Config:
+        arbitrary_types_allowed = True
+        extra = "allow"
+
+    def __init__(self, *args, **kwargs):
+        if len(args) == 1 and isinstance(args[0], FramadatePoll):
+            kwargs = args[0].dict()
+        data = kwargs
+        super().__init__(**data)
+        self._gen_html()
+
+    @classmethod
+    def from_day(cls, day: PolledDay) -> "Entry":
+        """Create the entry of a day, passing its fields by reference instead of
+        dumping the day"""
+        return cls(**{
+            field: value for field in ENTRY_FIELDS_FROM_DAY
+            if (value := getattr(day, field, None)) is not None
+        })
+
+    def _gen_html(self):  # todo: move to Poll
+        self._links, self._html = render_entry(
+            *(getattr(self, field) for field in RENDER_FIELDS)
+        )
+
+    @property
+    def html(self):
+        if not self._html:
+            self._gen_html()
+        return self._html
+
+    @property
+    def id(self) -> str:
+        """Stable key of the entry in the timeline, one per poll and day"""
+        return f"{self.poll_uri or self.poll_url}/{self.date.isoformat()}"
+
+
+class Entries(BaseModel):
+    items: list[Entry]
+    _html: Optional[str] = PrivateAttr("")
+
+    def _gen_html(self):
+        self._html = "\n".join([item.html for item in self.items])
+
+    def __init__(self, **data):
+        super().__init__(**data)
+        self._gen_html()
+
+    @property
+    def html(self):
+        if not self._html:
+            self._gen_html()
+        return self._html
+
+
+class EntryStore:
+    """Timeline entries keyed by poll and date
+
+    The days of all polls are kept in a date-ordered PollAggregation, so every day
+    is shown once no matter how often the polls are refreshed, and polls whose data
+    did not change are skipped. Entries are created when they are first shown, for
+    the days from today up to the horizon, and at most max_entries of them.
+    """
+
+    def __init__(
+            self,
+            horizon: timedelta = DEFAULT_HORIZON,
+            max_entries: int = DEFAULT_MAX_ENTRIES,
+    ):
+        self.horizon = horizon
+        self.max_entries = max_entries
+        self.aggregation = PollAggregation()
+        self._entries: Dict[DayKey, Entry] = {}
+        self._polls: Dict[str, FramadatePoll] = {}
+
+    def __len__(self) -> int:
+        return len(self.aggregation)
+
+    def in_horizon(self, date_: date, today: Optional[date] = None) -> bool:
+        today = today or datetime.now().date()
+        return today <= date_ <= today + self.horizon
+
+    def update_poll(self, poll: FramadatePoll, force: bool = False) -> bool:
+        """Replace the entries of the poll if its days changed, or always with force.
+        Returns whether they were replaced."""
+        self._polls[poll.poll_uri] = poll
+        if not self.aggregation.update_poll(poll, force=force):
+            return False
+        self._drop_entries(poll.poll_uri)
+        return True
+
+    def remove_poll(self, poll_uri: str) -> None:
+        self._polls.pop(poll_uri, None)
+        self.aggregation.remove_poll(poll_uri)
+        self._drop_entries(poll_uri)
+
+    def retain_polls(self, poll_uris: Iterable[str]) -> None:
+        """Remove all polls but the given ones"""
+        retained = set(poll_uris)
+        for poll_uri in self.aggregation.poll_uris:
+            if poll_uri not in retained:
+                self.remove_poll(poll_uri)
+
+    def _drop_entries(self, poll_uri: str) -> None:
+        for key in [key for key in self._entries if key[2] == poll_uri]:
+            del self._entries[key]
+
+    def entries(self, today: Optional[date] = None) -> List[Entry]:
+        """Entries within the horizon in chronological order, dropping past ones"""
+        today = today or datetime.now().date()
+        self.aggregation.prune(before=today)
+        for key in [key for key in self._entries if key[0] < today]:
+            del self._entries[key]
+        entries = []
+        for key in self.aggregation.keys(
+                today, today + self.horizon, limit=self.max_entries
+        ):
+            entry = self._entries.get(key)
+            if entry is None:
+                # Read the day in a consistent state, see FramadatePoll.lock
+                with self._polls[key[2]].lock:
+                    entry = self._entries[key] = Entry.from_day(self.aggregation[key])
+            entries.append(entry)
+        return entries